@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Script to add the indexes used by the rule-learning queries.
+
+The learn_rules query filters transactions_canonical on reviewed_at /
+confidence / normalized_desc and then groups by vendor_text and category
+columns. Without indexes every run full-scans the table, so this script
+creates a composite index matching the filter predicates plus a covering
+index for the grouped query.
+"""
+
+import mysql.connector
+import os
+
+def load_env_file():
+    """Load environment variables from .env file if it exists"""
+    env_file = '.env'
+    if os.path.exists(env_file):
+        with open(env_file, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#') and '=' in line:
+                    key, value = line.split('=', 1)
+                    os.environ[key] = value
+
+# Load environment variables
+load_env_file()
+
+# Database configuration
+DB_CONFIG = {
+    'host': os.getenv('DB_HOST', 'petgully-dbserver.cmzwm2y64qh8.us-east-1.rds.amazonaws.com'),
+    'user': os.getenv('DB_USER', 'admin'),
+    'password': os.getenv('DB_PASS', 'care6886'),
+    'database': os.getenv('DB_NAME', 'petgully_db'),
+    'port': int(os.getenv('DB_PORT', 3306))
+}
+
+# Indexes needed by the learn_rules queries:
+# - idx_tc_learn matches the WHERE predicates (reviewed_at, confidence)
+# - idx_tc_learn_covering also covers the grouped/projected columns so the
+#   aggregate can be served from the index without heap lookups
+# - uk_rules_name lets add_rules_to_database collapse its check+insert into
+#   one atomic INSERT ... ON DUPLICATE KEY UPDATE per batch
+INDEXES = [
+    ("transactions_canonical", "idx_tc_learn",
+     "(reviewed_at, confidence, normalized_desc(64))", False),
+    ("transactions_canonical", "idx_tc_learn_covering",
+     "(main_category_id, vendor_text(64), sub_category_text(64), confidence, normalized_desc(128))", False),
+    ("rules", "uk_rules_name", "(name)", True),
+    # Feeds the enhanced learner's GROUP BY CASE on vendor_text: the grouped
+    # scan can read vendor prefixes from the index instead of the heap
+    ("transactions_canonical", "idx_tc_vendor", "(vendor_text(64))", False),
+]
+
+def create_connection():
+    """Create database connection"""
+    try:
+        connection = mysql.connector.connect(**DB_CONFIG)
+        print(f"✅ Connected to MySQL database: {DB_CONFIG['database']}")
+        return connection
+    except mysql.connector.Error as err:
+        print(f"❌ Error connecting to MySQL: {err}")
+        return None
+
+def index_exists(cur, table_name, index_name):
+    """Check if an index already exists on the table"""
+    cur.execute("""
+        SELECT COUNT(*) FROM information_schema.statistics
+        WHERE table_schema = %s AND table_name = %s AND index_name = %s
+    """, (DB_CONFIG['database'], table_name, index_name))
+    return cur.fetchone()[0] > 0
+
+def add_indexes():
+    """Create the missing indexes"""
+    connection = create_connection()
+    if not connection:
+        return False
+
+    try:
+        cursor = connection.cursor()
+
+        added_count = 0
+        existing_count = 0
+
+        # Store rule keywords as a native JSON column so MySQL validates the
+        # documents and connectors that decode JSON hand back lists directly
+        cursor.execute("""
+            SELECT data_type FROM information_schema.columns
+            WHERE table_schema = %s AND table_name = 'rules' AND column_name = 'keywords'
+        """, (DB_CONFIG['database'],))
+        row = cursor.fetchone()
+        if row and row[0].lower() != 'json':
+            cursor.execute("ALTER TABLE rules MODIFY keywords JSON")
+            print("✅ Converted rules.keywords to native JSON")
+
+        # debit_credit is fully determined by amount, so let MySQL compute it
+        # as a stored generated column instead of every writer deriving it
+        cursor.execute("""
+            SELECT extra FROM information_schema.columns
+            WHERE table_schema = %s AND table_name = 'transactions_canonical'
+            AND column_name = 'debit_credit'
+        """, (DB_CONFIG['database'],))
+        row = cursor.fetchone()
+        if row and 'GENERATED' not in (row[0] or '').upper():
+            cursor.execute("""
+                ALTER TABLE transactions_canonical
+                DROP COLUMN debit_credit,
+                ADD COLUMN debit_credit VARCHAR(6)
+                GENERATED ALWAYS AS (IF(amount < 0, 'debit', 'credit')) STORED
+            """)
+            print("✅ Converted transactions_canonical.debit_credit to a generated column")
+
+        print(f"\n📝 Processing {len(INDEXES)} indexes...")
+
+        for table_name, index_name, columns, unique in INDEXES:
+            if index_exists(cursor, table_name, index_name):
+                print(f"✅ Index '{index_name}' already exists on {table_name}")
+                existing_count += 1
+                continue
+
+            kind = "UNIQUE INDEX" if unique else "INDEX"
+            cursor.execute(f"CREATE {kind} {index_name} ON {table_name} {columns}")
+            print(f"✅ Created index: {index_name} on {table_name} {columns}")
+            added_count += 1
+
+        connection.commit()
+
+        print(f"\n📊 Summary:")
+        print(f"   ✅ New indexes added: {added_count}")
+        print(f"   ℹ️  Indexes already existed: {existing_count}")
+
+        return True
+
+    except mysql.connector.Error as err:
+        print(f"❌ Database error: {err}")
+        return False
+    finally:
+        if connection.is_connected():
+            cursor.close()
+            connection.close()
+            print("🔌 Database connection closed")
+
+def main():
+    """Main entry point"""
+    print("🚀 Adding rule-learning indexes to database...")
+    print(f"📋 Database: {DB_CONFIG['database']}@{DB_CONFIG['host']}:{DB_CONFIG['port']}")
+
+    success = add_indexes()
+
+    if success:
+        print("\n🎉 All indexes successfully processed!")
+    else:
+        print("\n⚠️  Some indexes failed. Check the errors above.")
+
+if __name__ == "__main__":
+    main()
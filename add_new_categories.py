@@ -7,8 +7,14 @@ This will add all the new categories you've created in your Google Sheet.
 """
 
 import mysql.connector
+import logging
 import os
 
+# Per-category progress goes through logging so large batch reuse doesn't pay
+# a stdout sync per row; run with LOG_LEVEL=DEBUG to see individual items
+logging.basicConfig(level=os.getenv('LOG_LEVEL', 'WARNING'))
+log = logging.getLogger(__name__)
+
 def load_env_file():
     """Load environment variables from .env file if it exists"""
     env_file = '.env'
@@ -45,80 +51,127 @@ NEW_CATEGORIES = [
     "Opening Balance"
 ]
 
+# Connection pool, created lazily on first use. A one-shot run pays the same
+# TLS+auth handshake as before, but repeated calls in the same process (e.g.
+# from a scheduled job or web worker) reuse the pooled sockets.
+_pool = None
+
 def create_connection():
-    """Create database connection"""
+    """Get a pooled database connection"""
+    global _pool
     try:
-        connection = mysql.connector.connect(**DB_CONFIG)
+        if _pool is None:
+            _pool = mysql.connector.pooling.MySQLConnectionPool(
+                pool_name='categories', pool_size=4, **DB_CONFIG
+            )
+        connection = _pool.get_connection()
         print(f"✅ Connected to MySQL database: {DB_CONFIG['database']}")
         return connection
     except mysql.connector.Error as err:
         print(f"❌ Error connecting to MySQL: {err}")
         return None
 
+def ensure_unique_keys(cur):
+    """Add UNIQUE keys on categories_main (name, code) if they are missing"""
+    for index_name, column in (("uk_name", "name"), ("uk_code", "code")):
+        cur.execute("""
+            SELECT COUNT(*) FROM information_schema.statistics
+            WHERE table_schema = %s AND table_name = 'categories_main' AND index_name = %s
+        """, (DB_CONFIG['database'], index_name))
+        if cur.fetchone()[0] == 0:
+            cur.execute(f"ALTER TABLE categories_main ADD UNIQUE KEY {index_name} ({column})")
+            log.debug("Added unique key %s on categories_main(%s)", index_name, column)
+
 def get_or_create_category_id(category_name, cur):
     """
     Get category ID from categories_main table, create if doesn't exist
-    Returns the category ID
+    Returns (category_id, created) so callers can tell a fresh insert from
+    an existing row without sniffing strings
+
+    Relies on the UNIQUE keys added by ensure_unique_keys: the database
+    performs the get-or-create atomically in one round-trip, so there is no
+    probe loop to race against concurrent inserts.
     """
     if not category_name:
-        return None
-    
-    # First, try to find existing category
-    cur.execute("SELECT id FROM categories_main WHERE name = %s", (category_name,))
-    result = cur.fetchone()
-    
-    if result:
-        print(f"✅ Category '{category_name}' already exists (ID: {result[0]})")
-        return result[0]
-    
-    # Category doesn't exist, create it
+        return None, False
+
     # Generate a code from the category name
     code = category_name.upper().replace(' ', '').replace('&', '').replace('-', '')[:8]
-    
-    # Make sure code is unique
-    counter = 1
-    original_code = code
-    while True:
-        cur.execute("SELECT id FROM categories_main WHERE code = %s", (code,))
-        if not cur.fetchone():
-            break
-        code = f"{original_code}{counter}"
-        counter += 1
-    
-    # Insert new category
+
+    # Atomic get-or-create: the duplicate-key path reflects the existing
+    # row's id back through LAST_INSERT_ID (rowcount is 1 for a fresh
+    # insert, 2 when the duplicate-key branch fires)
     cur.execute("""
         INSERT INTO categories_main (code, name, is_active)
         VALUES (%s, %s, 1)
+        ON DUPLICATE KEY UPDATE id = LAST_INSERT_ID(id)
     """, (code, category_name))
-    
-    # Get the new category ID
+
+    created = cur.rowcount == 1
     category_id = cur.lastrowid
-    print(f"✅ Created new category: {category_name} (ID: {category_id}, Code: {code})")
-    
-    return category_id
+
+    if created:
+        log.debug("Created new category: %s (ID: %s, Code: %s)", category_name, category_id, code)
+    else:
+        log.debug("Category '%s' already exists (ID: %s)", category_name, category_id)
+
+    return category_id, created
+
+def generate_unique_code(category_name, existing_codes):
+    """Generate a code for the category that doesn't collide with existing codes"""
+    code = category_name.upper().replace(' ', '').replace('&', '').replace('-', '')[:8]
+
+    counter = 1
+    original_code = code
+    while code in existing_codes:
+        code = f"{original_code}{counter}"
+        counter += 1
+
+    return code
 
 def add_new_categories():
     """Add all new categories to the database"""
     connection = create_connection()
     if not connection:
         return False
-    
+
     try:
-        cursor = connection.cursor()
-        
-        added_count = 0
-        existing_count = 0
-        
+        # Server-side prepared statements: the INSERT is parsed/planned once
+        # and re-executed per row with binary-protocol parameters
+        cursor = connection.cursor(prepared=True)
+
+        ensure_unique_keys(cursor)
+
         print(f"\n📝 Processing {len(NEW_CATEGORIES)} new categories...")
-        
+
+        # Fetch all existing names and codes once, resolve everything in
+        # memory, then bulk-insert: two round-trips total instead of
+        # two-plus SELECTs and an INSERT per category
+        cursor.execute("SELECT name, code FROM categories_main")
+        existing = dict(cursor.fetchall())
+        existing_names = set(existing)
+        existing_codes = set(existing.values())
+
+        new_rows = []
         for category_name in NEW_CATEGORIES:
-            category_id = get_or_create_category_id(category_name, cursor)
-            if category_id:
-                if "already exists" in str(category_id):
-                    existing_count += 1
-                else:
-                    added_count += 1
-        
+            if category_name in existing_names:
+                log.debug("Category '%s' already exists", category_name)
+                continue
+
+            code = generate_unique_code(category_name, existing_codes)
+            existing_codes.add(code)
+            new_rows.append((code, category_name))
+            log.debug("Queued new category: %s (Code: %s)", category_name, code)
+
+        if new_rows:
+            cursor.executemany("""
+                INSERT INTO categories_main (code, name, is_active)
+                VALUES (%s, %s, 1)
+            """, new_rows)
+
+        added_count = len(new_rows)
+        existing_count = len(NEW_CATEGORIES) - added_count
+
         # Commit all changes
         connection.commit()
         
@@ -1,11 +1,27 @@
 from fastapi import FastAPI, Depends, Header, HTTPException
 from pydantic import BaseModel
 from typing import List, Optional, Tuple
-import os, re, hashlib, importlib, sys
+import os, re, hashlib, importlib, sys, time
+import asyncio
+import functools
+import logging
 import joblib
 
+# print() on the request path holds the GIL and flushes line-buffered stdout
+# under uvicorn; route everything through logging so formatting is deferred
+# and disabled levels cost one comparison
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "WARNING"))
+log = logging.getLogger("bank_api")
+
 # ---------- FastAPI ----------
-app = FastAPI()
+# Serialize responses with orjson when available: C-accelerated encoding
+# matters for /classify payloads of thousands of rows
+try:
+    import orjson  # noqa: F401  (also used by the rules cache below)
+    from fastapi.responses import ORJSONResponse
+    app = FastAPI(default_response_class=ORJSONResponse)
+except Exception:
+    app = FastAPI()
 
 # ---------- Security ----------
 API_KEY = os.getenv("API_KEY", "")
@@ -32,24 +48,61 @@ DB_USER = os.getenv("DB_USER")
 DB_PASS = os.getenv("DB_PASS")
 DB_NAME = os.getenv("DB_NAME")
 
+# Connection pool, created lazily so import never blocks on the database.
+# pool_reset_session=False skips the RESET round-trip on every checkout.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+_db_pool = None
+
 def get_conn():
-    return mysql.connector.connect(
-        host=DB_HOST, user=DB_USER, password=DB_PASS, database=DB_NAME
-    )
+    """Get a pooled connection; conn.close() returns it to the pool"""
+    global _db_pool
+    if _db_pool is None:
+        _db_pool = mysql.connector.pooling.MySQLConnectionPool(
+            pool_name="bank", pool_size=DB_POOL_SIZE, pool_reset_session=False,
+            host=DB_HOST, user=DB_USER, password=DB_PASS, database=DB_NAME
+        )
+    # Pre-ping: RDS drops idle sockets, so revive a stale pooled connection
+    # before handing it out instead of failing on the first query
+    conn = _db_pool.get_connection()
+    try:
+        conn.ping(reconnect=True, attempts=1, delay=0)
+    except mysql.connector.Error:
+        conn.close()
+        conn = _db_pool.get_connection()
+    return conn
 
 # ---------- ML artifacts (optional) ----------
 MODEL = None
 VECT = None
 ML_THRESHOLD = float(os.getenv("ML_THRESHOLD", "0.75"))  # used if model exists
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "8"))  # parallel LLM fallback calls
+
+# LLM subcategory results keyed by (main_category, vendor): rows from the
+# same vendor overwhelmingly get the same subcategory, so one round-trip
+# serves every later row until the entry ages out
+_SUB_CACHE = {}
+SUB_CACHE_TTL = 86400.0  # seconds
+SUB_CACHE_MAX = 10000
+
+# Bound once at load time so the per-batch path skips repeated attribute
+# resolution on the sklearn objects
+_CLASSES = None
+_VECT_TRANSFORM = None
+_PREDICT_PROBA = None
 
 def load_model():
-    global MODEL, VECT
+    global MODEL, VECT, _CLASSES, _VECT_TRANSFORM, _PREDICT_PROBA
     try:
-        VECT = joblib.load("model/tfidf.joblib")
-        MODEL = joblib.load("model/logreg.joblib")
-        print("ML model loaded.")
+        # mmap the arrays read-only: uvicorn workers then share the model
+        # pages through the OS cache instead of each holding a private copy
+        VECT = joblib.load("model/tfidf.joblib", mmap_mode='r')
+        MODEL = joblib.load("model/logreg.joblib", mmap_mode='r')
+        _CLASSES = MODEL.classes_
+        _VECT_TRANSFORM = VECT.transform
+        _PREDICT_PROBA = MODEL.predict_proba
+        log.info("ML model loaded.")
     except Exception as e:
-        print(f"ML model not loaded: {e}")
+        log.warning("ML model not loaded: %s", e)
 
 load_model()
 
@@ -57,36 +110,69 @@ load_model()
 import json
 from typing import List, Dict, Tuple
 
-# Cache for database rules
+# Optional orjson for faster JSON parsing/serialization on the rules paths
+try:
+    import orjson
+    _loads = orjson.loads
+    def _dumps(o):
+        return orjson.dumps(o).decode()
+except Exception:
+    orjson = None
+    _loads = json.loads
+    _dumps = json.dumps
+
+# Optional Aho-Corasick automaton: scans a narration against every rule
+# keyword in one pass instead of per-rule substring loops
+try:
+    import ahocorasick
+except Exception:
+    ahocorasick = None
+
+# Cache for database rules. Freshness comes from a cheap version probe
+# (row count + MAX(updated_at)) compared against the version the cache was
+# built from, instead of a coarse 5-minute TTL: writes through any path are
+# picked up on the next probe, and an unchanged table never triggers a full
+# reload. The probe itself is throttled so per-row callers don't pay a
+# query each.
 _db_rules_cache = None
-_db_rules_timestamp = None
-CACHE_DURATION = 300  # 5 minutes cache
+_db_rules_version = None
+_db_rules_checked_at = 0.0
+RULES_PROBE_INTERVAL = 1.0  # seconds between version probes
 
 def _load_rules_from_database():
-    """Load rules from database with caching"""
-    global _db_rules_cache, _db_rules_timestamp
-    
+    """Load rules from database with version-checked caching"""
+    global _db_rules_cache, _db_rules_version, _db_rules_checked_at
+
     import time
     current_time = time.time()
-    
-    # Return cached rules if still valid
-    if (_db_rules_cache is not None and 
-        _db_rules_timestamp is not None and 
-        current_time - _db_rules_timestamp < CACHE_DURATION):
+
+    # Probed recently: trust the cache without touching the database
+    if (_db_rules_cache is not None and
+        current_time - _db_rules_checked_at < RULES_PROBE_INTERVAL):
         return _db_rules_cache
-    
+
     try:
         conn = get_conn()
         cur = conn.cursor()
-        
+
+        # Cheap staleness probe: count + last modification time
+        cur.execute("SELECT COUNT(*), MAX(updated_at) FROM rules WHERE is_active = 1")
+        version = cur.fetchone()
+        _db_rules_checked_at = current_time
+
+        if _db_rules_cache is not None and version == _db_rules_version:
+            cur.close()
+            conn.close()
+            return _db_rules_cache
+
         # Fetch all active rules from database
         query = """
-        SELECT name, priority, keywords, main_category, sub_category, is_active
-        FROM rules 
-        WHERE is_active = 1 
+        SELECT id, name, priority, keywords, main_category, sub_category, is_active
+        FROM rules
+        WHERE is_active = 1
         ORDER BY priority ASC
         """
-        
+
         cur.execute(query)
         results = cur.fetchall()
         
@@ -95,20 +181,29 @@ def _load_rules_from_database():
         salary_rules = []
         
         for row in results:
-            name, priority, keywords_json, main_category, sub_category, is_active = row
+            rule_id, name, priority, keywords_json, main_category, sub_category, is_active = row
             
             if not is_active:
                 continue
                 
-            # Parse keywords JSON
-            try:
-                keywords = json.loads(keywords_json) if keywords_json else []
-            except (json.JSONDecodeError, TypeError):
-                keywords = []
+            # keywords is a native JSON column: connectors that decode it
+            # hand back a list directly, skipping the parse; fall through to
+            # _loads for drivers that return the raw document text.
+            # Uppercase once here so the match loop never re-normalizes, and
+            # store as a tuple for fast iteration.
+            if isinstance(keywords_json, list):
+                keywords = keywords_json
+            else:
+                try:
+                    keywords = _loads(keywords_json) if keywords_json else []
+                except (ValueError, TypeError):
+                    keywords = []
+            keywords = tuple(str(k).upper() for k in keywords)
             
             # Check if this is a salary rule
             if name.startswith("Salary: "):
                 salary_rules.append({
+                    "id": rule_id,
                     "name": name,
                     "priority": priority,
                     "keywords": keywords,
@@ -117,6 +212,7 @@ def _load_rules_from_database():
                 })
             else:
                 rules.append({
+                    "id": rule_id,
                     "name": name,
                     "priority": priority,
                     "keywords": keywords,
@@ -124,14 +220,43 @@ def _load_rules_from_database():
                     "sub_category": sub_category
                 })
         
+        # Build an Aho-Corasick automaton over the regular-rule keywords so
+        # apply_rules_wrapper scans each narration once regardless of rule
+        # count. Each keyword maps to the lowest matching rule index, which
+        # preserves the priority order of the sequential scan. Rebuilt only
+        # on cache reload, so the construction cost is amortized away.
+        automaton = None
+        if ahocorasick is not None and rules:
+            automaton = ahocorasick.Automaton()
+            for idx, rule in enumerate(rules):
+                for keyword in rule["keywords"]:
+                    if keyword and (not automaton.exists(keyword) or idx < automaton.get(keyword)):
+                        automaton.add_word(keyword, idx)
+            automaton.make_automaton()
+
+        # Fallback matcher when pyahocorasick is unavailable: a keyword ->
+        # lowest rule index map, deduped so a keyword shared by several
+        # rules is scanned once with the priority-winning rule attached.
+        # Each keyword keeps its own `in` check — a regex alternation is
+        # not equivalent, because non-overlapping finditer drops keywords
+        # nested inside a longer match and skews the winning rule index.
+        kw_to_idx = {}
+        if automaton is None and rules:
+            for idx, rule in enumerate(rules):
+                for keyword in rule["keywords"]:
+                    if keyword and (keyword not in kw_to_idx or idx < kw_to_idx[keyword]):
+                        kw_to_idx[keyword] = idx
+
         # Cache the results
         _db_rules_cache = {
             "rules": rules,
-            "salary_rules": salary_rules
+            "salary_rules": salary_rules,
+            "automaton": automaton,
+            "kw_to_idx": kw_to_idx
         }
-        _db_rules_timestamp = current_time
+        _db_rules_version = version
         
-        print(f"Loaded {len(rules)} regular rules and {len(salary_rules)} salary rules from database")
+        log.info("Loaded %d regular rules and %d salary rules from database", len(rules), len(salary_rules))
         
         cur.close()
         conn.close()
@@ -139,7 +264,7 @@ def _load_rules_from_database():
         return _db_rules_cache
         
     except Exception as e:
-        print(f"Error loading rules from database: {e}")
+        log.warning("Error loading rules from database: %s", e)
         return None
 
 def apply_rules_wrapper(narration: Optional[str]) -> Tuple[Optional[str], Optional[str], Optional[str]]:
@@ -147,20 +272,23 @@ def apply_rules_wrapper(narration: Optional[str]) -> Tuple[Optional[str], Option
     Apply rules from database to categorize transaction narration
     Returns: (main_category, sub_category, rule_name) or (None, None, None)
     """
-    if narration is None:
+    # Empty or whitespace-only narrations can never match a keyword, so
+    # skip the cache probe and rule scan entirely
+    if narration is None or not str(narration).strip():
         return (None, None, None)
-    
+
     # Load rules from database
     rules_data = _load_rules_from_database()
     if not rules_data:
         return (None, None, None)
-    
+
     text = str(narration).upper()
-    
+    salary_rules = rules_data["salary_rules"]
+
     try:
         # 1) Check salary rules first (highest precedence)
         # For salary rules, we need BOTH the employee name AND salary keywords
-        for rule in rules_data["salary_rules"]:
+        for rule in salary_rules:
             keywords = rule["keywords"]
             if len(keywords) >= 2:  # Should have employee name + salary keywords
                 employee_name = keywords[0]  # First keyword is employee name
@@ -171,15 +299,29 @@ def apply_rules_wrapper(narration: Optional[str]) -> Tuple[Optional[str], Option
                     return (rule["main_category"], rule["sub_category"], rule["name"])
         
         # 2) Check regular rules (by priority)
-        for rule in rules_data["rules"]:
-            if any(keyword in text for keyword in rule["keywords"]):
+        automaton = rules_data.get("automaton")
+        if automaton is not None:
+            # Single O(len(text)) scan; lowest rule index = highest priority
+            best_idx = min((idx for _, idx in automaton.iter(text)), default=None)
+            if best_idx is not None:
+                rule = rules_data["rules"][best_idx]
                 return (rule["main_category"], rule["sub_category"], rule["name"])
-        
+        else:
+            # One substring check per distinct keyword; identical hit set
+            # to the per-rule loops, minus re-scanning shared keywords
+            kw_to_idx = rules_data["kw_to_idx"]
+            best_idx = min(
+                (idx for kw, idx in kw_to_idx.items() if kw in text),
+                default=None)
+            if best_idx is not None:
+                rule = rules_data["rules"][best_idx]
+                return (rule["main_category"], rule["sub_category"], rule["name"])
+
         # 3) No rule matched
         return (None, None, None)
         
     except Exception as e:
-        print(f"Error applying rules: {e}")
+        log.warning("Error applying rules: %s", e)
         return (None, None, None)
 
 # ---------- Schemas ----------
@@ -195,6 +337,9 @@ class RowIn(BaseModel):
 class PredOut(RowIn):
     vendor: Optional[str] = ""
     rule_hit: Optional[str] = ""
+    # Echoed back so the client can round-trip it into /sync and skip
+    # re-normalization there
+    normalized_desc: Optional[str] = ""
     main_category_suggested: str
     sub_category_suggested: str
     confidence: float
@@ -204,6 +349,7 @@ class Rows(BaseModel):
 
 class SyncRowIn(RowIn):
     vendor: Optional[str] = None
+    normalized_desc: Optional[str] = None  # pass through from /classify if known
     main_category: Optional[str] = None
     sub_category: Optional[str] = None
     confidence: Optional[float] = None
@@ -230,10 +376,29 @@ class RulesPayload(BaseModel):
 
 
 # ---------- Utils ----------
+# Compiled once at import: normalize_desc runs per row in /classify and
+# /sync, so skip the re-module cache lookup on every call
+_RE_WS = re.compile(r'\s+')
+_RE_KEEP = re.compile(r'[^A-Za-z0-9 &:/._-]')
+
+# Token filtering for the rule learners: stopwords as a frozenset (one hash
+# lookup instead of a linear list scan per token) and a compiled scanner for
+# whole whitespace-delimited alphanumeric tokens. Tokens containing '-' or
+# '.' are rejected, not stripped-and-glued: a mangled keyword like
+# "UPISWIGGYINSTAMART" can never occur in narration text containing
+# "UPI-SWIGGYINSTAMART", so it would only produce dead rules.
+_STOPWORDS = frozenset({
+    "THE", "AND", "FOR", "WITH", "FROM", "TO", "OF", "IN", "ON", "AT", "BY",
+    "PAYMENT", "TRANSFER", "NEFT", "IMPS", "UPI",
+})
+_WORD_RE = re.compile(r'(?<!\S)[A-Z0-9]{3,}(?!\S)')
+
+@functools.lru_cache(maxsize=8192)
 def normalize_desc(s: str) -> str:
-    s = re.sub(r'\s+', ' ', s).strip()
-    s = re.sub(r'[^A-Za-z0-9 &:/._-]', '', s)
-    return s
+    # Recurring vendors mean the same raw description arrives again and
+    # again across /classify and /sync payloads; the cache turns the two
+    # regex passes into a dict hit for repeats
+    return _RE_KEEP.sub('', _RE_WS.sub(' ', s).strip())
 
 def tx_hash(account: str, date: str, amount: float, norm_desc: str) -> str:
     return hashlib.sha256(f"{account}|{date}|{amount:.2f}|{norm_desc}".encode("utf-8")).hexdigest()
@@ -242,10 +407,10 @@ def ml_main_category(desc: str) -> Tuple[str, float]:
     if MODEL is None or VECT is None:
         return "Uncategorized", 0.0
     try:
-        X = VECT.transform([desc])
-        proba = MODEL.predict_proba(X)[0]
+        X = _VECT_TRANSFORM([desc])
+        proba = _PREDICT_PROBA(X)[0]
         idx = proba.argmax()
-        label = MODEL.classes_[idx]
+        label = _CLASSES[idx]
         conf = float(proba[idx])
         return label, conf
     except Exception:
@@ -312,64 +477,69 @@ def learn_rules_from_database():
         ORDER BY frequency DESC, avg_confidence DESC
         """
         
+        cur.arraysize = 1000
         cur.execute(query)
-        results = cur.fetchall()
-        
+
         new_rules = []
         existing_keywords = set()
-        
+
         # Get existing rule keywords from database to avoid duplicates
         rules_data = _load_rules_from_database()
         if rules_data:
             for rule in rules_data["rules"] + rules_data["salary_rules"]:
                 existing_keywords.update(rule.get("keywords", []))
-        
-        for row in results:
-            normalized_desc, vendor_text, sub_category, main_category, frequency, avg_confidence = row
+
+        # Stream the grouped result set in batches instead of fetchall(),
+        # so only one batch of pattern rows is resident at a time
+        while True:
+            batch = cur.fetchmany(cur.arraysize)
+            if not batch:
+                break
+            for row in batch:
+                normalized_desc, vendor_text, sub_category, main_category, frequency, avg_confidence = row
             
-            if not main_category or not sub_category:
-                continue
+                if not main_category or not sub_category:
+                    continue
                 
-            # Extract potential keywords from normalized description
-            words = normalized_desc.upper().split()
-            keywords = []
-            
-            for word in words:
-                # Filter out common words, short words, and problematic characters
-                if (len(word) >= 3 and 
-                    word not in existing_keywords and
-                    word not in ["THE", "AND", "FOR", "WITH", "FROM", "TO", "OF", "IN", "ON", "AT", "BY", "PAYMENT", "TRANSFER", "NEFT", "IMPS", "UPI"] and
-                    word.isalnum() and  # Only alphanumeric characters
-                    not word.isdigit()):  # Not just numbers
-                    keywords.append(word)
+                # Extract potential keywords from normalized description;
+                # the scanner only yields whole alphanumeric tokens of 3+
+                # chars, so punctuated tokens are skipped rather than glued
+                keywords = []
+
+                for word in _WORD_RE.findall(normalized_desc.upper()):
+                    # Filter out common words and bare numbers
+                    if (word not in _STOPWORDS and
+                        word not in existing_keywords and
+                        not word.isdigit()):  # Not just numbers
+                        keywords.append(word)
             
-            # Also check vendor text
-            if vendor_text and len(vendor_text) >= 3:
-                vendor_clean = vendor_text.upper().strip()
-                if vendor_clean not in existing_keywords:
-                    keywords.append(vendor_clean)
+                # Also check vendor text
+                if vendor_text and len(vendor_text) >= 3:
+                    vendor_clean = vendor_text.upper().strip()
+                    if vendor_clean not in existing_keywords:
+                        keywords.append(vendor_clean)
             
-            if keywords and frequency >= 2 and avg_confidence > 0.8:
-                # Create rule name
-                rule_name = f"Auto-learned: {keywords[0]}"
-                if len(keywords) > 1:
-                    rule_name += f" +{len(keywords)-1}"
+                if keywords and frequency >= 2 and avg_confidence > 0.8:
+                    # Create rule name
+                    rule_name = f"Auto-learned: {keywords[0]}"
+                    if len(keywords) > 1:
+                        rule_name += f" +{len(keywords)-1}"
                 
-                new_rule = {
-                    "name": rule_name,
-                    "priority": 50,  # Medium priority for auto-learned rules
-                    "keywords": keywords[:3],  # Limit to top 3 keywords
-                    "main_category": main_category,
-                    "sub_category": sub_category,
-                    "frequency": frequency,
-                    "confidence": avg_confidence
-                }
-                new_rules.append(new_rule)
+                    new_rule = {
+                        "name": rule_name,
+                        "priority": 50,  # Medium priority for auto-learned rules
+                        "keywords": keywords[:3],  # Limit to top 3 keywords
+                        "main_category": main_category,
+                        "sub_category": sub_category,
+                        "frequency": frequency,
+                        "confidence": avg_confidence
+                    }
+                    new_rules.append(new_rule)
         
         return new_rules
         
     except Exception as e:
-        print(f"Error learning rules from database: {e}")
+        log.warning("Error learning rules from database: %s", e)
         return []
     finally:
         cur.close()
@@ -412,7 +582,7 @@ def get_or_create_category_id(category_name, cur):
     
     # Get the new category ID
     category_id = cur.lastrowid
-    print(f"Created new category: {category_name} (ID: {category_id}, Code: {code})")
+    log.debug("Created new category: %s (ID: %s, Code: %s)", category_name, category_id, code)
     
     return category_id
 
@@ -421,38 +591,38 @@ def add_rules_to_database(new_rules):
     Add new learned rules to the database
     """
     if not new_rules:
-        print("No new rules to add.")
+        log.debug("No new rules to add.")
         return False
     
     try:
         conn = get_conn()
+        # Plain cursor on purpose: only MySQLCursor.executemany rewrites a
+        # batch INSERT into one multi-row statement; the prepared cursor's
+        # executemany falls back to a per-row execute loop
         cur = conn.cursor()
-        
+
         # Clear cache to force reload
-        global _db_rules_cache, _db_rules_timestamp
+        global _db_rules_cache, _db_rules_version, _db_rules_checked_at
         _db_rules_cache = None
-        _db_rules_timestamp = None
-        
-        added_count = 0
+        _db_rules_version = None
+        _db_rules_checked_at = 0.0
         
-        for rule in new_rules:
-            # Check if rule already exists
-            check_query = "SELECT id FROM rules WHERE name = %s"
-            cur.execute(check_query, (rule["name"],))
-            if cur.fetchone():
-                print(f"Rule '{rule['name']}' already exists, skipping")
-                continue
-            
-            # Insert new rule
-            insert_query = """
-            INSERT INTO rules (name, priority, keywords, main_category, sub_category, is_active, frequency, confidence, created_at, updated_at, created_by)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, NOW(), NOW(), %s)
-            """
-            
-            values = (
+        # Duplicate names are short-circuited by the database via the
+        # uk_rules_name UNIQUE key (added by add_indexes.py): one atomic
+        # batched statement, no SELECT-then-INSERT race. rowcount after
+        # executemany counts 1 per fresh insert and 2 per duplicate hit,
+        # which recovers the number actually added.
+        insert_query = """
+        INSERT INTO rules (name, priority, keywords, main_category, sub_category, is_active, frequency, confidence, created_at, updated_at, created_by)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, NOW(), NOW(), %s)
+        ON DUPLICATE KEY UPDATE updated_at = NOW()
+        """
+
+        values = [
+            (
                 rule["name"],
                 rule["priority"],
-                json.dumps(rule["keywords"]),
+                _dumps(rule["keywords"]),
                 rule["main_category"],
                 rule["sub_category"],
                 1,  # is_active
@@ -460,13 +630,14 @@ def add_rules_to_database(new_rules):
                 rule.get("confidence", 0.95),
                 "auto-learned"
             )
-            
-            cur.execute(insert_query, values)
-            added_count += 1
-            print(f"Added rule: {rule['name']}")
-        
+            for rule in new_rules
+        ]
+
+        cur.executemany(insert_query, values)
+        added_count = 2 * len(values) - cur.rowcount  # inserts=1, dup updates=2
+
         conn.commit()
-        print(f"Successfully added {added_count} new rules to database")
+        log.info("Successfully added %d new rules to database", added_count)
         
         cur.close()
         conn.close()
@@ -474,7 +645,7 @@ def add_rules_to_database(new_rules):
         return added_count > 0
         
     except Exception as e:
-        print(f"Error adding rules to database: {e}")
+        log.warning("Error adding rules to database: %s", e)
         return False
 
 def auto_learn_from_manual_corrections(manual_corrections):
@@ -489,15 +660,22 @@ def auto_learn_from_manual_corrections(manual_corrections):
         conn = get_conn()
         cur = conn.cursor()
         
-        # Get existing rules for conflict detection
+        # Get existing rules for conflict detection. The cached rules double
+        # as an inverted keyword index so every conflict / duplicate check
+        # below is an in-memory lookup instead of a JSON_CONTAINS full scan
+        # of the rules table per keyword.
         rules_data = _load_rules_from_database()
         existing_keywords = set()
+        kw_index = {}
         if rules_data:
             for rule in rules_data["rules"] + rules_data["salary_rules"]:
                 existing_keywords.update(rule.get("keywords", []))
-        
+                for kw in rule.get("keywords", []):
+                    kw_index.setdefault(kw, []).append(rule)
+
         new_rules = []
         updated_rules = []
+        conflict_updates = {}  # rule id -> (main_category, sub_category)
         
         for correction in manual_corrections:
             description = correction["description"].upper()
@@ -505,22 +683,19 @@ def auto_learn_from_manual_corrections(manual_corrections):
             main_category = correction["main_category"]
             sub_category = correction["sub_category"]
             
-            # Extract keywords from description
-            words = description.split()
+            # Extract keywords from description: whole alphanumeric tokens
+            # only, so punctuated tokens are skipped rather than glued
             keywords = []
-            
-            for word in words:
-                # Filter out common words and short words
-                if (len(word) >= 3 and 
-                    word not in ["THE", "AND", "FOR", "WITH", "FROM", "TO", "OF", "IN", "ON", "AT", "BY", "PAYMENT", "TRANSFER", "NEFT", "IMPS", "UPI"] and
-                    word.isalnum() and
-                    not word.isdigit()):
+
+            for word in _WORD_RE.findall(description):
+                # Filter out common words and bare numbers
+                if word not in _STOPWORDS and not word.isdigit():
                     keywords.append(word)
-            
+
             # Also check vendor text
             if vendor and len(vendor) >= 3:
                 vendor_clean = vendor.upper().strip()
-                if vendor_clean not in ["THE", "AND", "FOR", "WITH", "FROM", "TO", "OF", "IN", "ON", "AT", "BY", "PAYMENT", "TRANSFER", "NEFT", "IMPS", "UPI"]:
+                if vendor_clean not in _STOPWORDS:
                     keywords.append(vendor_clean)
             
             # Special handling for salary rules - need employee name + salary keywords
@@ -546,59 +721,52 @@ def auto_learn_from_manual_corrections(manual_corrections):
                     keywords = salary_keywords
             
             if keywords:
-                # Check for conflicting rules with same keywords but different categories
+                # Check for conflicting rules with same keywords but
+                # different categories via the in-memory keyword index
                 conflicting_rules = []
                 for keyword in keywords[:3]:  # Check top 3 keywords
-                    cur.execute("""
-                        SELECT id, name, main_category, sub_category, keywords 
-                        FROM rules 
-                        WHERE JSON_CONTAINS(keywords, %s) 
-                        AND (main_category != %s OR sub_category != %s)
-                        AND is_active = 1
-                    """, (json.dumps(keyword), main_category, sub_category))
-                    
-                    conflicts = cur.fetchall()
-                    conflicting_rules.extend(conflicts)
-                
+                    for candidate in kw_index.get(keyword, []):
+                        if (candidate["main_category"] != main_category or
+                                candidate["sub_category"] != sub_category):
+                            conflicting_rules.append(candidate)
+
                 if conflicting_rules:
                     # Ensure the new category exists in categories_main
                     get_or_create_category_id(main_category, cur)
-                    
-                    # Update conflicting rules to match the manual correction
+
+                    # Retarget conflicting rules to match the manual
+                    # correction; the UPDATEs are deduped by rule id and
+                    # flushed with one executemany after the loop
                     for conflict in conflicting_rules:
-                        rule_id, old_name, old_main, old_sub, old_keywords = conflict
-                        
-                        # Update the conflicting rule
-                        cur.execute("""
-                            UPDATE rules 
-                            SET main_category = %s, sub_category = %s, 
-                                updated_at = NOW(), created_by = 'manual-updated'
-                            WHERE id = %s
-                        """, (main_category, sub_category, rule_id))
-                        
+                        rule_id = conflict["id"]
+                        if rule_id in conflict_updates:
+                            continue
+                        conflict_updates[rule_id] = (main_category, sub_category)
+
                         updated_rules.append({
                             "id": rule_id,
-                            "old_name": old_name,
-                            "old_category": f"{old_main} → {old_sub}",
+                            "old_name": conflict["name"],
+                            "old_category": f"{conflict['main_category']} → {conflict['sub_category']}",
                             "new_category": f"{main_category} → {sub_category}"
                         })
-                        
-                        print(f"Updated conflicting rule: {old_name} ({old_main} → {old_sub}) → ({main_category} → {sub_category})")
-                
+
+                        log.debug("Updated conflicting rule: %s (%s → %s) → (%s → %s)",
+                                  conflict['name'], conflict['main_category'],
+                                  conflict['sub_category'], main_category, sub_category)
+
                 # Check if we need to create a new rule (no conflicts found)
                 if not conflicting_rules:
                     # Ensure the new category exists in categories_main
                     get_or_create_category_id(main_category, cur)
-                    
-                    # Check if exact rule already exists
-                    cur.execute("""
-                        SELECT id FROM rules 
-                        WHERE main_category = %s AND sub_category = %s 
-                        AND JSON_CONTAINS(keywords, %s)
-                        AND is_active = 1
-                    """, (main_category, sub_category, json.dumps(keywords[0])))
-                    
-                    if not cur.fetchone():
+
+                    # Check if an exact rule already exists (in memory)
+                    exists = any(
+                        candidate["main_category"] == main_category and
+                        candidate["sub_category"] == sub_category
+                        for candidate in kw_index.get(keywords[0], [])
+                    )
+
+                    if not exists:
                         # Create new rule
                         rule_name = f"Manual: {keywords[0]}"
                         if len(keywords) > 1:
@@ -618,56 +786,149 @@ def auto_learn_from_manual_corrections(manual_corrections):
         # Add new rules to database
         if new_rules:
             add_rules_to_database(new_rules)
-            print(f"Auto-learned {len(new_rules)} new rules from manual corrections")
-        
-        if updated_rules:
+            log.info("Auto-learned %d new rules from manual corrections", len(new_rules))
+
+        if conflict_updates:
+            # One batched UPDATE per unique conflicting rule id
+            cur.executemany("""
+                UPDATE rules
+                SET main_category = %s, sub_category = %s,
+                    updated_at = NOW(), created_by = 'manual-updated'
+                WHERE id = %s
+            """, [(main, sub, rule_id) for rule_id, (main, sub) in conflict_updates.items()])
             conn.commit()
-            print(f"Updated {len(updated_rules)} conflicting rules based on manual corrections")
+            log.info("Updated %d conflicting rules based on manual corrections", len(updated_rules))
         
         # Clear cache to force reload
-        global _db_rules_cache, _db_rules_timestamp
+        global _db_rules_cache, _db_rules_version, _db_rules_checked_at
         _db_rules_cache = None
-        _db_rules_timestamp = None
+        _db_rules_version = None
+        _db_rules_checked_at = 0.0
         
         cur.close()
         conn.close()
         
     except Exception as e:
-        print(f"Error auto-learning from manual corrections: {e}")
+        log.warning("Error auto-learning from manual corrections: %s", e)
 
 # ---------- Endpoints ----------
-@app.post("/classify", response_model=List[PredOut], dependencies=[Depends(require_key)])
-def classify(rows: Rows):
-    out: List[PredOut] = []
-    for r in rows.rows:
-        nd = normalize_desc(r.description)
-        vendor = (nd.split(' ')[0][:40] if nd else "")
-
-        # External rules first
-        main, sub, rule = apply_rules_wrapper(nd)
+# response_model=None: the rows are assembled server-side from validated
+# input, so re-running Pydantic field validation over every output row only
+# burns CPU at high N. PredOut still documents the shape for readers.
+@app.post("/classify", response_model=None, dependencies=[Depends(require_key)])
+async def classify(rows: Rows):
+    # Normalize and rule-match the whole batch first, then run the ML model
+    # once over every rule-miss row: one VECT.transform/predict_proba call
+    # on a wide matrix instead of N single-row calls
+    nds = [normalize_desc(r.description) for r in rows.rows]
+
+    # The rule scan can trigger synchronous MySQL work (the cache version
+    # probe and full reloads) and the ML fallback is CPU-bound sklearn —
+    # both would stall the event loop, so the whole phase runs in a worker
+    # thread, like the sync def baseline did implicitly via the threadpool
+    def _scan_and_score():
+        # Vendors recur, so the same narration often appears many times in
+        # one payload: memoize the rule scan per unique normalized
+        # description
+        rule_cache = {}
+        hits = []
+        for nd in nds:
+            if nd not in rule_cache:
+                rule_cache[nd] = apply_rules_wrapper(nd)
+            hits.append(rule_cache[nd])
+
+        miss = [i for i, (m, _, _) in enumerate(hits) if not m]
+        preds = {}
+        if miss and MODEL is not None and VECT is not None:
+            try:
+                # Duplicate narrations recur within a batch: vectorize and
+                # score each unique description once, then fan back out
+                uniq = list(dict.fromkeys(nds[i] for i in miss))
+                X = _VECT_TRANSFORM(uniq)
+                P = _PREDICT_PROBA(X)
+                labels = _CLASSES[P.argmax(axis=1)]
+                confs = P.max(axis=1)
+                by_desc = {d: (labels[j], float(confs[j])) for j, d in enumerate(uniq)}
+                preds = {i: by_desc[nds[i]] for i in miss}
+            except Exception:
+                preds = {}
+        return hits, preds
+
+    rule_hits, ml_preds = await asyncio.to_thread(_scan_and_score)
+
+    # Resolve main category and confidence per row before touching the LLM
+    resolved = []
+    for i in range(len(rows.rows)):
+        main, sub, rule = rule_hits[i]
         conf = 0.95 if main else 0.0
 
         # ML fallback only if no rule matched
         if not main:
-            pred, pconf = ml_main_category(nd)
+            pred, pconf = ml_preds.get(i, ("Uncategorized", 0.0))
             if pconf >= ML_THRESHOLD:
                 main, conf = pred, pconf
             else:
                 main, conf = "Uncategorized", pconf
 
-        # Subcategory: use rule sub if provided, else LLM fallback
-        sub_final = sub if sub else llm_subcategory(nd, r.amount, main)
+        resolved.append((main, conf, sub))
+
+    # LLM subcategory fallback for rows without a rule sub, fanned out
+    # concurrently: each call is a blocking HTTP round-trip, so it runs in
+    # a worker thread and the batch completes in ~1 RTT instead of N. The
+    # semaphore keeps the fanout polite toward the API.
+    llm_subs = {}
+    llm_idx = [i for i, (_, _, sub) in enumerate(resolved) if not sub]
+    if llm_idx:
+        # Serve repeat vendors from the (main, vendor) cache; only true
+        # misses go over the network
+        now = time.time()
+        to_call = []
+        for i in llm_idx:
+            vendor_key = (resolved[i][0], nds[i].split(' ')[0][:40] if nds[i] else "")
+            hit = _SUB_CACHE.get(vendor_key)
+            if hit is not None and now - hit[1] < SUB_CACHE_TTL:
+                llm_subs[i] = hit[0]
+            else:
+                to_call.append((i, vendor_key))
+
+        if to_call:
+            sem = asyncio.Semaphore(LLM_CONCURRENCY)
+
+            async def _llm(i):
+                async with sem:
+                    r = rows.rows[i]
+                    return await asyncio.to_thread(llm_subcategory, nds[i], r.amount, resolved[i][0])
+
+            subs = await asyncio.gather(*(_llm(i) for i, _ in to_call))
+            if len(_SUB_CACHE) > SUB_CACHE_MAX:
+                _SUB_CACHE.clear()
+            for (i, vendor_key), sub in zip(to_call, subs):
+                llm_subs[i] = sub
+                _SUB_CACHE[vendor_key] = (sub, now)
+
+    out: List[dict] = []
+    for i, r in enumerate(rows.rows):
+        nd = nds[i]
+        vendor = (nd.split(' ')[0][:40] if nd else "")
+
+        main, conf, sub = resolved[i]
+        rule = rule_hits[i][2]
+        sub_final = sub if sub else llm_subs.get(i, "Misc")
 
-        out.append(PredOut(
+        out.append(dict(
             row_index=r.row_index, date=r.date, description=r.description, amount=r.amount,
             balance=r.balance, account=r.account, currency=r.currency,
-            vendor=vendor, rule_hit=rule or "",
+            vendor=vendor, rule_hit=rule or "", normalized_desc=nd,
             main_category_suggested=main, sub_category_suggested=sub_final, confidence=conf
         ))
     return out
 
 @app.post("/sync", dependencies=[Depends(require_key)])
 def sync(rows: SyncRows):
+    # Plain cursor on purpose: its executemany rewrites each batch INSERT
+    # into one multi-row statement, which is what delivers the 2-round-trip
+    # batching below — the prepared cursor's executemany would quietly
+    # degrade to a per-row execute loop
     conn = get_conn(); cur = conn.cursor()
 
     ins_raw = """
@@ -676,39 +937,46 @@ def sync(rows: SyncRows):
     VALUES (%s,%s,%s,%s,%s,%s,%s,NOW())
     """
 
+    # debit_credit is a stored generated column (see add_indexes.py), so the
+    # server derives it from amount and it drops out of the insert entirely
     ins_can = """
     INSERT IGNORE INTO transactions_canonical
-    (raw_hash, posted_at, normalized_desc, amount, debit_credit, vendor_text,
+    (raw_hash, posted_at, normalized_desc, amount, vendor_text,
      main_category_text, sub_category_text, confidence, source, reviewed_at)
-    VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,'sheet',NOW())
+    VALUES (%s,%s,%s,%s,%s,%s,%s,%s,'sheet',NOW())
     """
 
 
     # Track manual corrections for rule learning
     manual_corrections = []
 
+    # Accumulate both inserts and flush them with one executemany each:
+    # 2 round-trips for the whole batch instead of 2 per row
+    raw_batch = []
+    can_batch = []
+
     for r in rows.rows:
-        nd = normalize_desc(r.description)
+        # Trust the normalization computed in /classify when the client
+        # round-trips it; recompute only for rows that arrive without it
+        nd = r.normalized_desc or normalize_desc(r.description)
         h = tx_hash(r.account or "", r.date, r.amount, nd)
 
-        cur.execute(ins_raw, (h, r.date, r.description, r.amount, r.balance, r.account, r.currency))
+        raw_batch.append((h, r.date, r.description, r.amount, r.balance, r.account, r.currency))
 
         main_cat = r.main_category if r.main_category else None
         sub_cat = r.sub_category if r.sub_category else None
 
-        debit_credit = 'debit' if r.amount < 0 else 'credit'
-        cur.execute(ins_can, (
+        can_batch.append((
             h,
             r.date,
             nd,
             r.amount,
-            debit_credit,
             r.vendor,
             main_cat,
             sub_cat,
             r.confidence if r.confidence is not None else 0.0
         ))
-        
+
         # Track manual corrections for potential rule learning
         if r.main_category and r.sub_category:
             manual_corrections.append({
@@ -718,6 +986,10 @@ def sync(rows: SyncRows):
                 "sub_category": r.sub_category
             })
 
+    if raw_batch:
+        cur.executemany(ins_raw, raw_batch)
+        cur.executemany(ins_can, can_batch)
+
     conn.commit()
     
     # Auto-learn rules from manual corrections (disabled for now)
@@ -725,7 +997,7 @@ def sync(rows: SyncRows):
     #    try:
     #       auto_learn_from_manual_corrections(manual_corrections)
     #    except Exception as e:
-    #        print(f"Error auto-learning from manual corrections: {e}")
+    #        log.warning("Error auto-learning from manual corrections: %s", e)
     
     cur.close(); conn.close()
     return {"ok": True, "inserted": len(rows.rows)}
@@ -736,7 +1008,7 @@ def learn_rules():
     Manually trigger rule learning from verified database transactions
     """
     try:
-        print("Starting rule learning process...")
+        log.info("Starting rule learning process...")
         
         # Learn new rules from database
         new_rules = learn_rules_from_database()
@@ -775,7 +1047,7 @@ def learn_rules():
             }
             
     except Exception as e:
-        print(f"Error in learn_rules endpoint: {e}")
+        log.warning("Error in learn_rules endpoint: %s", e)
         return {
             "ok": False,
             "message": f"Error learning rules: {str(e)}",
@@ -837,7 +1109,7 @@ def get_rule_stats():
         }
         
     except Exception as e:
-        print(f"Error getting rule stats: {e}")
+        log.warning("Error getting rule stats: %s", e)
         return {
             "ok": False,
             "message": f"Error getting statistics: {str(e)}"
@@ -849,11 +1121,12 @@ def clear_rules_cache():
     Clear the rules cache to force reload from database
     """
     try:
-        global _db_rules_cache, _db_rules_timestamp
+        global _db_rules_cache, _db_rules_version, _db_rules_checked_at
         _db_rules_cache = None
-        _db_rules_timestamp = None
+        _db_rules_version = None
+        _db_rules_checked_at = 0.0
         
-        print("Rules cache cleared - will reload from database on next request")
+        log.info("Rules cache cleared - will reload from database on next request")
         
         return {
             "ok": True,
@@ -861,7 +1134,7 @@ def clear_rules_cache():
         }
         
     except Exception as e:
-        print(f"Error clearing cache: {e}")
+        log.warning("Error clearing cache: %s", e)
         return {
             "ok": False,
             "message": f"Error clearing cache: {str(e)}"
@@ -888,10 +1161,13 @@ def get_rules():
 
     out = []
     for (rule_id, name, priority, keywords_json, main_cat, sub_cat, is_active) in rows:
-        try:
-            keywords = json.loads(keywords_json) if keywords_json else []
-        except Exception:
-            keywords = []
+        if isinstance(keywords_json, list):
+            keywords = keywords_json
+        else:
+            try:
+                keywords = _loads(keywords_json) if keywords_json else []
+            except Exception:
+                keywords = []
 
         out.append({
             "id": rule_id,
@@ -933,37 +1209,40 @@ def sync_rules(payload: RulesPayload):
                     %s, %s, NOW(), NOW(), %s)
         """
 
-        count = 0
-        for r in payload.rules:
-            keywords_json = json.dumps(r.keywords or [])
-            cur.execute(
-                insert_sql,
-                (
-                    r.name,
-                    r.priority,
-                    keywords_json,
-                    r.main_category,
-                    r.sub_category,
-                    1 if r.is_active else 0,
-                    0,          # frequency (default)
-                    0.95,       # confidence (default)
-                    "sheet-sync"
-                ),
+        values = [
+            (
+                r.name,
+                r.priority,
+                _dumps(r.keywords or []),
+                r.main_category,
+                r.sub_category,
+                1 if r.is_active else 0,
+                0,          # frequency (default)
+                0.95,       # confidence (default)
+                "sheet-sync"
             )
-            count += 1
+            for r in payload.rules
+        ]
+
+        count = len(values)
+        if values:
+            # Batched insert: the driver collapses this into a multi-row
+            # INSERT instead of one round-trip per rule
+            cur.executemany(insert_sql, values)
 
         conn.commit()
 
         # 3) Clear cache so new rules are used on next /classify
-        global _db_rules_cache, _db_rules_timestamp
+        global _db_rules_cache, _db_rules_version, _db_rules_checked_at
         _db_rules_cache = None
-        _db_rules_timestamp = None
+        _db_rules_version = None
+        _db_rules_checked_at = 0.0
 
         return {"ok": True, "count": count}
 
     except Exception as e:
         conn.rollback()
-        print(f"Error syncing rules: {e}")
+        log.warning("Error syncing rules: %s", e)
         raise HTTPException(status_code=500, detail=f"Error syncing rules: {e}")
 
     finally:
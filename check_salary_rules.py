@@ -15,6 +15,13 @@ try:
     
     cur = conn.cursor()
 
+    def parse_keywords(keywords_json):
+        # keywords is a native JSON column; decoding connectors hand back a
+        # list directly, otherwise fall back to parsing the document text
+        if isinstance(keywords_json, list):
+            return keywords_json
+        return json.loads(keywords_json) if keywords_json else []
+
     # Check salary rules
     print("Checking salary rules...")
     cur.execute("SELECT name, keywords, main_category, sub_category FROM rules WHERE name LIKE 'Salary:%' ORDER BY priority")
@@ -23,18 +30,25 @@ try:
     print(f'=== SALARY RULES IN DATABASE ({len(salary_rules)} found) ===')
     for rule in salary_rules:
         name, keywords_json, main, sub = rule
-        keywords = json.loads(keywords_json) if keywords_json else []
+        keywords = parse_keywords(keywords_json)
         print(f'{name}: {keywords} -> {main} -> {sub}')
 
-    # Check for any rules with "DASARI" in keywords
+    # Check for any rules with "DASARI" in keywords. JSON_SEARCH's search
+    # string is a LIKE pattern, so '%DASARI%' matches it inside full-name
+    # keywords like "DASARI VAMSHI" while still comparing against decoded
+    # JSON values — no false positives from JSON escaping in the document
+    # text, unlike a raw LIKE over the column.
     print("\nChecking for DASARI rules...")
-    cur.execute("SELECT name, keywords, main_category, sub_category FROM rules WHERE keywords LIKE '%DASARI%'")
+    cur.execute("""
+        SELECT name, keywords, main_category, sub_category FROM rules
+        WHERE JSON_SEARCH(keywords, 'one', '%DASARI%') IS NOT NULL
+    """)
     dasari_rules = cur.fetchall()
 
     print(f'\n=== RULES WITH DASARI ({len(dasari_rules)} found) ===')
     for rule in dasari_rules:
         name, keywords_json, main, sub = rule
-        keywords = json.loads(keywords_json) if keywords_json else []
+        keywords = parse_keywords(keywords_json)
         print(f'{name}: {keywords} -> {main} -> {sub}')
 
     cur.close()
